@@ -1,7 +1,9 @@
 import streamlit as st
 
+from instrumentation import show_metrics_panel
+
 # Set the page title and icon
-st.set_page_config(page_title="BlockHack2024 Project Overview", page_icon=":rocket:")
+st.set_page_config(page_title="BlockHack2024 Project Overview", page_icon="🚀")
 
 # Main title
 st.title("Welcome to BlockHack2024 - Our Blockchain Innovation")
@@ -37,4 +39,4 @@ Explore, learn, and innovate with us at BlockHack2024. Whether you're here for t
         of how it works!
             """)
 
-
+show_metrics_panel()
@@ -0,0 +1,182 @@
+"""Headless load generator and benchmark suite for EthereumScholarshipSystem.
+
+Builds a ledger of the requested size without Streamlit, then measures key
+generation, generate_proof/verify_proof, add_transaction,
+get_all_transactions and a mixed issue/spend/transfer/admin-listing
+workload. Each benchmark reports throughput, p50/p99 latency and the peak
+RSS of the process so far.
+
+    python benchmarks/ledger_bench.py --accounts 10000 --transactions 1000000
+    python benchmarks/ledger_bench.py --save-baseline       # record benchmarks/baseline.json
+    python benchmarks/ledger_bench.py --baseline benchmarks/baseline.json  # fail on regressions
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ledger import EthereumScholarshipSystem  # noqa: E402
+from zkp import DEFAULT_ENGINE, ENGINES, EnhancedZKProof  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    return peak / (2**20 if platform.system() == 'Darwin' else 2**10)
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def measure(name, fn, iterations):
+    """Call fn(i) `iterations` times and summarize the per-call latencies."""
+    latencies = []
+    start = time.perf_counter()
+    for i in range(iterations):
+        call_start = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - call_start)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'name': name,
+        'ops': iterations,
+        'throughput': iterations / elapsed,
+        'p50_us': percentile(latencies, 0.50) * 1e6,
+        'p99_us': percentile(latencies, 0.99) * 1e6,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def build_system(accounts, transactions, engine, rng):
+    system = EthereumScholarshipSystem(engine)
+    students = [f"Student{i}" for i in range(1, accounts + 1)]
+    for student in students:
+        system.add_account(student)
+    # Populate straight through add_transaction; the workload below exercises the full API.
+    admin = system.accounts['Admin']
+    admin.balance = 10**15
+    for i in range(transactions // 2):
+        student = students[rng.randrange(accounts)]
+        admin.add_transaction(-1, f"Issue scholarship to {student}", student)
+        system.accounts[student].add_transaction(1, "Receive scholarship", 'Admin', is_frozen=True)
+    return system, students
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    results = []
+
+    for engine in args.engines:
+        results.append(measure(f"keygen[{engine}]", lambda i: ENGINES[engine].generate_keys(), args.keygen_ops))
+        private_key, public_key = EnhancedZKProof.generate_keys(engine)
+        proofs = {}
+
+        def prove(i):
+            proofs[i] = EnhancedZKProof.generate_proof(private_key, f"payload{i}")
+
+        results.append(measure(f"generate_proof[{engine}]", prove, args.proof_ops))
+        # Fresh payloads each time, so the verified-proof cache can't short-circuit the check.
+        results.append(measure(f"verify_proof[{engine}]",
+                               lambda i: EnhancedZKProof.verify_proof(public_key, proofs[i], f"payload{i}"),
+                               args.proof_ops))
+
+    build_start = time.perf_counter()
+    system, students = build_system(args.accounts, args.transactions, args.ledger_engine, rng)
+    print(f"built {args.accounts:,} accounts / {len(system.journal):,} transactions "
+          f"in {time.perf_counter() - build_start:.1f}s", file=sys.stderr)
+
+    admin = system.accounts['Admin']
+    results.append(measure("add_transaction",
+                           lambda i: admin.add_transaction(-1, "Benchmark", students[i % len(students)]),
+                           args.add_ops))
+    results.append(measure("get_all_transactions", lambda i: system.get_all_transactions(), args.listing_ops))
+
+    purposes = system.educational_purposes
+    vendors = sorted(system.approved_vendors)
+
+    def issue(i):
+        system.issue_scholarship(rng.choice(students), rng.randint(1, 100))
+
+    def spend(i):
+        system.spend_scholarship(rng.choice(students), rng.choice(vendors), rng.randint(1, 50), rng.choice(purposes))
+
+    def transfer(i):
+        system.transfer_scholarship(rng.choice(students), rng.choice(students), rng.randint(1, 50))
+
+    def admin_listing(i):
+        system.journal.page(limit=50)
+
+    operations = [('issue', issue), ('spend', spend), ('transfer', transfer), ('admin_listing', admin_listing)]
+    weights = [int(weight) for weight in args.mix.split(':')]
+    schedule = rng.choices(range(len(operations)), weights=weights, k=args.workload_ops)
+    results.append(measure(f"workload[{args.mix}]", lambda i: operations[schedule[i]][1](i), args.workload_ops))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return the benchmarks whose throughput fell more than `tolerance` below the baseline."""
+    previous = {result['name']: result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get(result['name'])
+        if before and result['throughput'] < before['throughput'] * (1 - tolerance):
+            regressions.append(f"{result['name']}: {result['throughput']:.1f}/s vs baseline {before['throughput']:.1f}/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--accounts', type=int, default=10_000)
+    parser.add_argument('--transactions', type=int, default=1_000_000)
+    parser.add_argument('--engines', nargs='+', default=['rsa', 'ed25519', 'p256'], choices=sorted(ENGINES))
+    parser.add_argument('--ledger-engine', default=DEFAULT_ENGINE, choices=sorted(ENGINES),
+                        help="signature engine for the ledger's accounts")
+    parser.add_argument('--keygen-ops', type=int, default=20)
+    parser.add_argument('--proof-ops', type=int, default=500)
+    parser.add_argument('--add-ops', type=int, default=20_000)
+    parser.add_argument('--listing-ops', type=int, default=5)
+    parser.add_argument('--workload-ops', type=int, default=5_000)
+    parser.add_argument('--mix', default='2:5:2:1', help="issue:spend:transfer:admin_listing weights")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write results as JSON to this path")
+    parser.add_argument('--save-baseline', action='store_true', help=f"write results to {BASELINE_PATH}")
+    parser.add_argument('--baseline', help="compare against a saved baseline and exit 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed throughput drop vs baseline")
+    args = parser.parse_args()
+
+    results = run(args)
+    print(f"{'benchmark':<32}{'ops':>8}{'ops/s':>12}{'p50 us':>12}{'p99 us':>12}{'peak RSS MB':>14}")
+    for r in results:
+        print(f"{r['name']:<32}{r['ops']:>8}{r['throughput']:>12.1f}{r['p50_us']:>12.1f}{r['p99_us']:>12.1f}{r['peak_rss_mb']:>14.1f}")
+
+    report = {
+        'config': {key: value for key, value in vars(args).items()
+                   if key not in ('output', 'save_baseline', 'baseline', 'tolerance')},
+        'python': platform.python_version(),
+        'results': results,
+    }
+    for path in filter(None, [args.output, BASELINE_PATH if args.save_baseline else None]):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
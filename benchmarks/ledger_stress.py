@@ -0,0 +1,119 @@
+"""Hammer one shared EthereumScholarshipSystem from many threads.
+
+Each thread runs a random mix of issue, spend, batch spend, transfer and
+bulk issuance to brand-new accounts, the way concurrent Streamlit sessions
+would, while a reader thread keeps listing accounts and balances. Afterwards
+the ledger invariants are checked: total value is conserved, no balance went
+negative, and every account's balance and nonce agree with its journal.
+
+    python benchmarks/ledger_stress.py --threads 16 --ops 500
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ledger import EthereumScholarshipSystem  # noqa: E402
+
+STUDENTS = [f'Student{i}' for i in range(1, 9)]
+
+
+def worker(system, seed, ops, errors):
+    rng = random.Random(seed)
+    purposes = sorted(system.educational_purposes)
+    try:
+        for _ in range(ops):
+            operation = rng.random()
+            student = rng.choice(STUDENTS)
+            if operation < 0.25:
+                system.issue_scholarship(student, rng.randint(1, 50))
+            elif operation < 0.5:
+                system.spend_scholarship(student, rng.choice(sorted(system.approved_vendors)),
+                                         rng.randint(1, 40), rng.choice(purposes))
+            elif operation < 0.55:
+                system.spend_scholarships([(rng.choice(STUDENTS), rng.choice(sorted(system.approved_vendors)),
+                                            rng.randint(1, 40), rng.choice(purposes)) for _ in range(rng.randint(1, 4))])
+            elif operation < 0.65:
+                # Creates accounts while other threads iterate system.accounts.
+                names = [f'New{seed}-{rng.randrange(10**9)}' for _ in range(rng.randint(1, 3))]
+                system.issue_scholarships(pd.DataFrame({'student': names, 'amount': [rng.randint(1, 20) for _ in names]}))
+            else:
+                other = rng.choice([s for s in STUDENTS if s != student])
+                system.transfer_scholarship(student, other, rng.randint(1, 40))
+    except Exception as e:
+        errors.append(e)
+
+
+def reader(system, stop, errors):
+    try:
+        while not stop.is_set():
+            system.student_names()
+            system.balances_as_of(time.time())
+            sum(account.balance for account in system.accounts.values())
+    except Exception as e:
+        errors.append(e)
+
+
+def check_invariants(system, initial_total):
+    problems = []
+    total = sum(account.balance + account.frozen_balance for account in system.accounts.values())
+    if total != initial_total:
+        problems.append(f"value not conserved: {total} != {initial_total}")
+    for name, account in system.accounts.items():
+        if account.balance < 0 or account.frozen_balance < 0:
+            problems.append(f"{name} has a negative balance")
+        seqs = system.journal.by_account.get(name, [])
+        if account.nonce != len(seqs):
+            problems.append(f"{name} nonce {account.nonce} != {len(seqs)} journal entries")
+        if seqs:
+            row = system.journal.store.row(seqs[-1])
+            if (row['balance'], row['frozen_balance']) != (account.balance, account.frozen_balance):
+                problems.append(f"{name} balance does not match its last journal entry")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--ops', type=int, default=500, help="operations per thread")
+    parser.add_argument('--engine', default='ed25519')
+    args = parser.parse_args()
+
+    # Switch threads far more often than the default 5 ms so races actually interleave.
+    sys.setswitchinterval(1e-6)
+    system = EthereumScholarshipSystem(args.engine)
+    for student in STUDENTS:
+        system.add_account(student)
+    initial_total = sum(account.balance + account.frozen_balance for account in system.accounts.values())
+
+    errors = []
+    stop = threading.Event()
+    threads = [threading.Thread(target=worker, args=(system, seed, args.ops, errors)) for seed in range(args.threads)]
+    readers = [threading.Thread(target=reader, args=(system, stop, errors))]
+    start = time.perf_counter()
+    for thread in threads + readers:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    for thread in readers:
+        thread.join()
+
+    problems = [repr(e) for e in errors] + check_invariants(system, initial_total)
+    print(f"{args.threads * args.ops:,} operations, {len(system.journal):,} transactions in {elapsed:.2f}s")
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    if problems:
+        sys.exit(1)
+    print("OK: all invariants hold")
+
+
+if __name__ == "__main__":
+    main()
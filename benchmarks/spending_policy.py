@@ -0,0 +1,77 @@
+"""Benchmark the compiled spending policy against the original branch chain.
+
+The legacy check is the set-lookup chain spend_scholarship used before the
+policy engine. Rules are padded with synthetic vendors and purposes to show
+how each approach scales as the rule set grows.
+
+    python benchmarks/spending_policy.py --spends 200000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from policy import SpendingPolicy  # noqa: E402
+
+
+def synthetic_rules(size):
+    purposes = {f"Purpose{i}": {"per_transaction": 1000, "per_period": 10**12} for i in range(size)}
+    purposes.update({"Tuition": {"per_transaction": 10000, "per_period": 10**12},
+                     "Books": {"per_transaction": 1000, "per_period": 10**12}})
+    return {
+        "vendors": [f"Vendor{i}" for i in range(1, size + 2)],
+        "purposes": purposes,
+        "disallowed": [f"Banned{i}" for i in range(size)] + ["Buy Alcohol"],
+    }
+
+
+def legacy_check(rules, vendor, amount, purpose):
+    approved_vendors, educational_purposes, disallowed_purposes, spending_limits = rules
+    if vendor not in approved_vendors:
+        return "Vendor not approved for educational expenses"
+    if purpose in disallowed_purposes:
+        return f"Spending on '{purpose}' is not allowed."
+    if purpose not in educational_purposes:
+        return "Purpose is not educational"
+    if amount > spending_limits.get(purpose, 0):
+        return f"Amount exceeds spending limit for {purpose}"
+    return None
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--spends', type=int, default=200_000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'rules':>6}{'legacy (us/spend)':>20}{'compiled (us/spend)':>22}{'batch (us/spend)':>19}")
+    for size in (2, 100, 10_000):
+        rules = synthetic_rules(size)
+        policy = SpendingPolicy(rules)
+        legacy_rules = (set(rules['vendors']), set(rules['purposes']), set(rules['disallowed']),
+                        {p: limits['per_transaction'] for p, limits in rules['purposes'].items()})
+        # Mostly legitimate spends, with a tail of unknown vendors and disallowed or unknown purposes.
+        vendors = policy.vendors[:2] * 9 + ["Nobody"]
+        purposes = ["Tuition", "Books"] * 9 + [policy.disallowed_purposes[-1], "Unknown"]
+        spends = [(f"Student{rng.randrange(1000)}", rng.choice(vendors),
+                   rng.randint(1, 1200), rng.choice(purposes)) for _ in range(args.spends)]
+
+        legacy = timed(lambda: [legacy_check(legacy_rules, v, a, p) for _, v, a, p in spends])
+        compiled = timed(lambda: [policy.check(s, v, a, p) for s, v, a, p in spends])
+        columns = [[spend[i] for spend in spends] for i in range(4)]
+        batch = timed(lambda: policy.check_batch(*columns))
+        scale = 1e6 / args.spends
+        print(f"{size:>6}{legacy * scale:>20.2f}{compiled * scale:>22.2f}{batch * scale:>19.2f}")
+
+
+if __name__ == "__main__":
+    main()
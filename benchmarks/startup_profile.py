@@ -0,0 +1,104 @@
+"""Cold-start import profile for the landing page and each app page.
+
+Every script runs in a fresh interpreter under `python -X importtime`, in
+Streamlit's bare mode (no server), with a throwaway data directory and the
+real Cohere backend selected (with a placeholder key if none is set), so a
+page that builds its client on load pays for cohere and httpx here too. No
+page calls the model before user input, so nothing goes over the network.
+The report shows the total import time, the slowest top-level imports, the
+wall time to run the script once and the process's peak RSS; with --budget
+it exits 1 if a script goes over.
+
+    python benchmarks/startup_profile.py
+    python benchmarks/startup_profile.py Hello.py --top 15
+    python benchmarks/startup_profile.py --budget benchmarks/startup_budget.json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'startup_budget.json')
+DEFAULT_SCRIPTS = ['Hello.py', 'pages/1Freeze.py', 'pages/2Solidity_Game.py', 'pages/3Solidy_Game_AI.py', 'pages/4EthBot.py']
+
+RUNNER = """
+import platform, resource, runpy, sys, time, logging
+logging.disable(logging.WARNING)  # bare-mode "missing ScriptRunContext" noise
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+runpy.run_path({script!r}, run_name='__main__')
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if platform.system() == 'Darwin' else 2**10)
+print('STARTUP', time.perf_counter() - start, peak)
+"""
+
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def profile(script):
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = dict(os.environ, ETHCASH_DATA_DIR=data_dir, ETHCASH_LLM_BACKEND='cohere',
+                   COHERE_API_KEY=os.environ.get('COHERE_API_KEY', 'startup-profile'))
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', RUNNER.format(root=ROOT, script=os.path.join(ROOT, script))],
+            cwd=data_dir, env=env, capture_output=True, text=True,
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"{script} failed:\n{result.stderr[-2000:]}")
+
+    top_level = []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        # Only the outermost imports (one space after the bar); their cumulative times add up to the total.
+        if match and len(match.group(3)) == 1:
+            top_level.append((int(match.group(2)) / 1e3, match.group(4)))
+    run_s, peak_mb = next(line.split()[1:] for line in result.stdout.splitlines() if line.startswith('STARTUP'))
+    return {
+        'script': script,
+        'import_ms': sum(ms for ms, _ in top_level),
+        'run_ms': float(run_s) * 1e3,
+        'peak_rss_mb': float(peak_mb),
+        'slowest': sorted(top_level, reverse=True),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('scripts', nargs='*', default=DEFAULT_SCRIPTS)
+    parser.add_argument('--top', type=int, default=8, help="slowest top-level imports to list per script")
+    parser.add_argument('--budget', help="JSON of {script: {import_ms, peak_rss_mb}}; exit 1 when exceeded")
+    parser.add_argument('--save-budget', action='store_true',
+                        help=f"write the measured numbers plus 25%% headroom to {BUDGET_PATH}")
+    args = parser.parse_args()
+
+    reports = [profile(script) for script in args.scripts]
+    for report in reports:
+        print(f"{report['script']}: imports {report['import_ms']:.0f} ms, "
+              f"first run {report['run_ms']:.0f} ms, peak RSS {report['peak_rss_mb']:.0f} MB")
+        for ms, module in report['slowest'][:args.top]:
+            print(f"    {ms:8.1f} ms  {module}")
+
+    if args.save_budget:
+        with open(BUDGET_PATH, 'w') as f:
+            json.dump({r['script']: {'import_ms': round(r['import_ms'] * 1.25), 'peak_rss_mb': round(r['peak_rss_mb'] * 1.25)}
+                       for r in reports}, f, indent=2)
+
+    if args.budget:
+        with open(args.budget) as f:
+            budget = json.load(f)
+        over = [
+            f"{r['script']}: {metric} {r[metric]:.0f} over budget {budget[r['script']][metric]}"
+            for r in reports if r['script'] in budget
+            for metric in ('import_ms', 'peak_rss_mb') if r[metric] > budget[r['script']][metric]
+        ]
+        for line in over:
+            print(f"OVER BUDGET: {line}")
+        if over:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Compare the dict-per-transaction ledger layout with the columnar store.
+
+Reports memory per million transactions and the time to build the Admin
+View DataFrame for both layouts.
+
+    python benchmarks/transaction_store.py --rows 1000000
+"""
+import argparse
+import gc
+import hashlib
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from columnar import TransactionStore  # noqa: E402
+
+ACCOUNTS = ['Admin', 'Student1', 'Student2', 'Vendor1', 'Vendor2']
+PURPOSES = [None, 'Tuition', 'Books', 'School Supplies', 'Accommodation']
+
+
+def synthetic_rows(count):
+    now = time.time()
+    for i in range(count):
+        account = ACCOUNTS[i % len(ACCOUNTS)]
+        yield (now + i * 0.001, account, i % 1000 - 500, f"Spend at {ACCOUNTS[(i + 1) % len(ACCOUNTS)]}",
+               i, i // 2, hashlib.sha256(str(i).encode()).digest(), PURPOSES[i % len(PURPOSES)])
+
+
+def build_dicts(count):
+    transactions = []
+    for timestamp, account, amount, description, balance, frozen, digest, purpose in synthetic_rows(count):
+        transactions.append({
+            'timestamp': datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S"),
+            'amount': amount,
+            'description': description,
+            'balance': balance,
+            'frozen_balance': frozen,
+            'tx_hash': digest.hex(),
+            'purpose': purpose
+        })
+    return transactions
+
+
+def build_store(count):
+    store = TransactionStore()
+    for row in synthetic_rows(count):
+        store.append(*row)
+    return store
+
+
+def measure(build, count):
+    gc.collect()
+    tracemalloc.start()
+    result = build(count)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+    scale = 1_000_000 / args.rows
+
+    transactions, dict_bytes = measure(build_dicts, args.rows)
+    dict_time = timed(lambda: pd.DataFrame(sorted(transactions, key=lambda x: x['timestamp'], reverse=True)))
+    del transactions
+
+    store, store_bytes = measure(build_store, args.rows)
+    store_time = timed(lambda: store.frame())
+
+    print(f"rows: {args.rows:,}")
+    print(f"{'layout':<10}{'MiB per 1M tx':>16}{'Admin View build (s)':>24}")
+    print(f"{'dicts':<10}{dict_bytes * scale / 2**20:>16.1f}{dict_time:>24.3f}")
+    print(f"{'columnar':<10}{store_bytes * scale / 2**20:>16.1f}{store_time:>24.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Chapter content for the Solidity games, loaded once per process.
+
+A pack is a JSON or TOML file in chapters/ with a name, a version and a
+list of chapters (title, task, code, quiz, and optionally story and the
+solidity_grader checks for the player's own code). Packs are validated
+and their derived data (dedented code, quiz option order) computed when
+first loaded. Every session and page then shares the same
+read-only mapping of chapter number to chapter.
+"""
+import json
+import os
+import random
+import textwrap
+import threading
+import tomllib
+from types import MappingProxyType
+
+CHAPTERS_DIR = os.environ.get('ETHCASH_CHAPTERS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chapters'))
+DEFAULT_PACK = 'solidity_basics'
+
+
+def read_pack(path):
+    if path.endswith('.toml'):
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compile_chapter(number, raw, shuffle_options=False):
+    for field in ('title', 'task', 'code', 'quiz'):
+        if not raw.get(field):
+            raise ValueError(f"chapter {number}: missing '{field}'")
+    quiz = raw['quiz']
+    for field in ('question', 'options', 'answer'):
+        if not quiz.get(field):
+            raise ValueError(f"chapter {number}: quiz is missing '{field}'")
+    options = list(quiz['options'])
+    if len(options) < 2 or len(set(options)) != len(options):
+        raise ValueError(f"chapter {number}: quiz needs at least two distinct options")
+    if quiz['answer'] not in options:
+        raise ValueError(f"chapter {number}: answer '{quiz['answer']}' is not one of the options")
+    if shuffle_options:
+        # Seeded by the title so every session and rerun sees the same order.
+        random.Random(raw['title']).shuffle(options)
+
+    chapter = {
+        'number': number,
+        'title': raw['title'],
+        'task': raw['task'],
+        'code': textwrap.dedent(raw['code']).strip('\n') + '\n',
+        'quiz': MappingProxyType({
+            'question': quiz['question'],
+            'options': tuple(options),
+            'answer': quiz['answer'],
+        }),
+    }
+    if raw.get('story'):
+        chapter['story'] = textwrap.dedent(raw['story']).strip()
+    checks = raw.get('checks', [])
+    if not all(isinstance(check, dict) and check.get('check') for check in checks):
+        raise ValueError(f"chapter {number}: every check needs a 'check' kind")
+    chapter['checks'] = tuple(MappingProxyType(dict(check)) for check in checks)
+    return MappingProxyType(chapter)
+
+
+def compile_pack(pack, source='pack'):
+    if not isinstance(pack.get('version'), int):
+        raise ValueError(f"{source}: missing integer 'version'")
+    if not pack.get('chapters'):
+        raise ValueError(f"{source}: no chapters")
+    try:
+        return MappingProxyType({
+            number: compile_chapter(number, raw, pack.get('shuffle_options', False))
+            for number, raw in enumerate(pack['chapters'], start=1)
+        })
+    except ValueError as e:
+        raise ValueError(f"{source}: {e}") from None
+
+
+_packs = {}
+_packs_lock = threading.Lock()
+
+
+def load_chapters(name=DEFAULT_PACK, chapters_dir=None):
+    """The named pack as a read-only {chapter number: chapter} mapping, compiled on first use."""
+    chapters_dir = chapters_dir or CHAPTERS_DIR
+    key = (chapters_dir, name)
+    pack = _packs.get(key)
+    if pack is None:
+        with _packs_lock:
+            if key not in _packs:
+                for extension in ('.json', '.toml'):
+                    path = os.path.join(chapters_dir, name + extension)
+                    if os.path.exists(path):
+                        break
+                else:
+                    raise FileNotFoundError(f"No chapter pack '{name}' in {chapters_dir}")
+                _packs[key] = compile_pack(read_pack(path), path)
+            pack = _packs[key]
+    return pack
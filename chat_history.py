@@ -0,0 +1,72 @@
+"""Bounded chat history for the chatbot.
+
+The last few turns are sent verbatim as long as they fit a token budget.
+When they overflow, the oldest messages are folded into a running summary
+in one step, down to half the window, so summarizing happens every few
+turns instead of on every turn and the request size stays flat however
+long the conversation runs.
+"""
+from instrumentation import count
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English text; close enough for budgeting.
+    return (len(text) + 3) // 4
+
+
+def extractive_summary(summary, messages, max_tokens):
+    """Summarizer that needs no model: the first sentence of each folded message, newest kept."""
+    lines = [summary] if summary else []
+    for message in messages:
+        first_sentence = message['message'].strip().split('\n')[0].split('. ')[0]
+        lines.append(f"{message['role']}: {first_sentence[:200]}")
+    text = '\n'.join(lines)
+    return text[-max_tokens * 4:]
+
+
+class ChatHistory:
+    def __init__(self, max_messages=8, token_budget=2000, summary_tokens=300, summarize=None):
+        self.max_messages = max_messages
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        # summarize(previous_summary, messages, max_tokens) -> new summary
+        self.summarize = summarize or extractive_summary
+        self.messages = []
+        self.summary = ''
+        self.folded = 0
+        self._tokens = 0
+
+    def add(self, role, message):
+        self.messages.append({'role': role, 'message': message})
+        self._tokens += estimate_tokens(message)
+        if len(self.messages) > self.max_messages or self._tokens > self.token_budget:
+            self._fold()
+
+    def _fold(self):
+        cut = 0
+        tokens = self._tokens
+        while cut < len(self.messages) and (len(self.messages) - cut > self.max_messages // 2
+                                            or tokens > self.token_budget // 2):
+            tokens -= estimate_tokens(self.messages[cut]['message'])
+            cut += 1
+        folded, self.messages = self.messages[:cut], self.messages[cut:]
+        try:
+            summary = self.summarize(self.summary, folded, self.summary_tokens)
+        except Exception:
+            summary = extractive_summary(self.summary, folded, self.summary_tokens)
+        # Hold the summarizer to its budget even if it ignores the requested length.
+        self.summary = summary[:self.summary_tokens * 4]
+        self.folded += len(folded)
+        self._tokens = tokens
+        count('chat_history.folds')
+
+    def window(self):
+        """The chat_history to send: the running summary, if any, then the recent messages."""
+        window = list(self.messages)
+        if self.summary:
+            window.insert(0, {'role': 'System', 'message': f"Summary of the earlier conversation:\n{self.summary}"})
+        count('chat_history.tokens_sent', self.tokens())
+        return window
+
+    def tokens(self):
+        return self._tokens + (estimate_tokens(self.summary) if self.summary else 0)
@@ -0,0 +1,129 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import timed
+
+_HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+
+
+class StringDictionary:
+    """Dictionary encoding for a low-cardinality string column."""
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def encode(self, value):
+        if value is None:
+            return -1
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def decode(self, code):
+        return None if code < 0 else self.values[code]
+
+    def categorical(self, codes):
+        return pd.Categorical.from_codes(codes, categories=pd.Index(self.values, dtype=object))
+
+
+def hex_digests(digests):
+    """Vectorized hex encoding of an (n, 32) uint8 array into a string column."""
+    nibbles = np.empty((len(digests), digests.shape[1] * 2), dtype=np.uint8)
+    nibbles[:, 0::2] = _HEX_DIGITS[digests >> 4]
+    nibbles[:, 1::2] = _HEX_DIGITS[digests & 0x0F]
+    return nibbles.view(f"S{nibbles.shape[1]}").ravel().astype(str)
+
+
+class TransactionStore:
+    """Columnar, array-backed transaction storage.
+
+    A row's sequence number is its position. Amounts and balances are int64,
+    timestamps are epoch seconds, hashes are raw 32-byte digests and the
+    account, description and purpose columns are dictionary encoded.
+    """
+
+    def __init__(self, capacity=1024):
+        self._size = 0
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.amounts = np.zeros(capacity, dtype=np.int64)
+        self.balances = np.zeros(capacity, dtype=np.int64)
+        self.frozen_balances = np.zeros(capacity, dtype=np.int64)
+        self.hashes = np.zeros((capacity, 32), dtype=np.uint8)
+        self.account_codes = np.zeros(capacity, dtype=np.int32)
+        self.description_codes = np.zeros(capacity, dtype=np.int32)
+        self.purpose_codes = np.zeros(capacity, dtype=np.int32)
+        self.accounts = StringDictionary()
+        self.descriptions = StringDictionary()
+        self.purposes = StringDictionary()
+
+    _ARRAYS = ('timestamps', 'amounts', 'balances', 'frozen_balances', 'hashes',
+               'account_codes', 'description_codes', 'purpose_codes')
+
+    def __len__(self):
+        return self._size
+
+    def _grow(self):
+        for name in self._ARRAYS:
+            array = getattr(self, name)
+            grown = np.zeros((len(array) * 2,) + array.shape[1:], dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+
+    def append(self, timestamp, account, amount, description, balance, frozen_balance, tx_hash, purpose):
+        if self._size == len(self.amounts):
+            self._grow()
+        seq = self._size
+        self.timestamps[seq] = timestamp
+        self.account_codes[seq] = self.accounts.encode(account)
+        self.amounts[seq] = amount
+        self.description_codes[seq] = self.descriptions.encode(description)
+        self.balances[seq] = balance
+        self.frozen_balances[seq] = frozen_balance
+        self.hashes[seq] = np.frombuffer(tx_hash, dtype=np.uint8)
+        self.purpose_codes[seq] = self.purposes.encode(purpose)
+        self._size += 1
+        return seq
+
+    def row(self, seq):
+        return {
+            'seq': seq,
+            'timestamp': datetime.fromtimestamp(self.timestamps[seq]).strftime("%Y-%m-%d %H:%M:%S"),
+            'account': self.accounts.decode(self.account_codes[seq]),
+            'amount': int(self.amounts[seq]),
+            'description': self.descriptions.decode(self.description_codes[seq]),
+            'balance': int(self.balances[seq]),
+            'frozen_balance': int(self.frozen_balances[seq]),
+            'tx_hash': self.hashes[seq].tobytes().hex(),
+            'purpose': self.purposes.decode(self.purpose_codes[seq]),
+        }
+
+    @timed('ledger.frame')
+    def frame(self, seqs=None, columns=None):
+        """Build a DataFrame over all rows, or the given seqs, without per-row objects."""
+        if seqs is None:
+            seqs = slice(0, self._size)
+            seq_column = np.arange(self._size)
+        else:
+            seqs = np.asarray(seqs, dtype=np.int64)
+            seq_column = seqs
+        builders = {
+            'seq': lambda: seq_column,
+            'timestamp': lambda: pd.to_datetime(self.timestamps[seqs], unit='s', utc=True)
+                .tz_convert(datetime.now().astimezone().tzinfo).tz_localize(None).floor('s'),
+            'account': lambda: self.accounts.categorical(self.account_codes[seqs]),
+            'amount': lambda: self.amounts[seqs],
+            'description': lambda: self.descriptions.categorical(self.description_codes[seqs]),
+            'balance': lambda: self.balances[seqs],
+            'frozen_balance': lambda: self.frozen_balances[seqs],
+            'tx_hash': lambda: hex_digests(self.hashes[seqs]),
+            'purpose': lambda: self.purposes.categorical(self.purpose_codes[seqs]),
+        }
+        return pd.DataFrame({name: builders[name]() for name in columns or builders}, copy=False)
+
+    def nbytes(self):
+        return sum(getattr(self, name)[:self._size].nbytes for name in self._ARRAYS)
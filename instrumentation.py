@@ -0,0 +1,171 @@
+"""Lightweight timing and counters for hot paths and Streamlit reruns.
+
+    with timer('cohere.chat'):
+        ...
+
+    @timed('zkp.generate_proof')
+    def generate_proof(...):
+        ...
+
+Each timer keeps a call count, a running total and a ring buffer of the
+most recent durations, from which percentiles are computed on demand.
+Set ETHCASH_METRICS=0 (or call set_enabled(False)) to turn recording off;
+timed functions then cost one flag check per call.
+
+This module doesn't import Streamlit unless show_metrics_panel() is called,
+so the ledger modules and benchmarks can use it headless.
+"""
+import json
+import os
+import time
+from collections import deque
+from functools import wraps
+
+WINDOW = 1024
+
+enabled = os.environ.get('ETHCASH_METRICS', '1') != '0'
+
+_histograms = {}
+_counters = {}
+
+
+def set_enabled(flag):
+    global enabled
+    enabled = flag
+
+
+class Histogram:
+    __slots__ = ('count', 'total', 'recent')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=WINDOW)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.recent.append(seconds)
+
+    def summary(self):
+        recent = sorted(self.recent)
+        pick = lambda fraction: recent[min(len(recent) - 1, int(fraction * len(recent)))] if recent else 0.0
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1e3 if self.count else 0.0,
+            'p50_ms': pick(0.50) * 1e3,
+            'p90_ms': pick(0.90) * 1e3,
+            'p99_ms': pick(0.99) * 1e3,
+            'max_ms': recent[-1] * 1e3 if recent else 0.0,
+            'last_ms': self.recent[-1] * 1e3 if self.recent else 0.0,
+        }
+
+
+def observe(name, seconds):
+    histogram = _histograms.get(name)
+    if histogram is None:
+        histogram = _histograms.setdefault(name, Histogram())
+    histogram.observe(seconds)
+
+
+def count(name, amount=1):
+    if enabled:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+class timer:
+    """Time a block as a context manager, or explicitly with start()/stop()."""
+
+    __slots__ = ('name', '_start')
+
+    def __init__(self, name):
+        self.name = name
+        self._start = None
+
+    def start(self):
+        self._start = time.perf_counter() if enabled else None
+        return self
+
+    def stop(self):
+        if self._start is not None:
+            observe(self.name, time.perf_counter() - self._start)
+            self._start = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def timed(name=None):
+    def decorate(fn):
+        metric = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(metric, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def snapshot():
+    return {
+        'timers': {name: histogram.summary() for name, histogram in sorted(_histograms.items())},
+        'counters': dict(sorted(_counters.items())),
+    }
+
+
+def to_json():
+    return json.dumps(snapshot(), indent=2)
+
+
+def to_prometheus():
+    """Prometheus text exposition: a summary per timer (recent-window quantiles) and a counter per count()."""
+    metric = lambda name: 'ethcash_' + ''.join(c if c.isalnum() else '_' for c in name)
+    lines = []
+    for name, histogram in sorted(_histograms.items()):
+        summary = histogram.summary()
+        base = metric(name) + '_seconds'
+        lines.append(f"# TYPE {base} summary")
+        for quantile, key in (('0.5', 'p50_ms'), ('0.9', 'p90_ms'), ('0.99', 'p99_ms')):
+            lines.append(f'{base}{{quantile="{quantile}"}} {summary[key] / 1e3:.9f}')
+        lines.append(f"{base}_sum {histogram.total:.9f}")
+        lines.append(f"{base}_count {histogram.count}")
+    for name, value in sorted(_counters.items()):
+        lines.append(f"# TYPE {metric(name)}_total counter")
+        lines.append(f"{metric(name)}_total {value}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    _histograms.clear()
+    _counters.clear()
+
+
+def show_metrics_panel():
+    """Sidebar expander with the recent timings plus JSON/Prometheus downloads."""
+    if not enabled:
+        return
+    import streamlit as st
+
+    with st.sidebar.expander("⏱️ Performance"):
+        stats = snapshot()
+        if stats['timers']:
+            # A Markdown table rather than st.dataframe, so the landing page doesn't have to import pandas.
+            columns = ['count', 'mean_ms', 'p50_ms', 'p99_ms', 'last_ms']
+            rows = [f"| {name} | " + " | ".join(f"{summary[c]:.2f}" if c != 'count' else str(summary[c]) for c in columns) + " |"
+                    for name, summary in stats['timers'].items()]
+            st.markdown("\n".join([f"| timer | {' | '.join(columns)} |", "|---" * (len(columns) + 1) + "|"] + rows))
+        else:
+            st.caption("No timings recorded yet.")
+        if stats['counters']:
+            st.json(stats['counters'])
+        st.download_button("Export JSON", to_json(), file_name="metrics.json", mime="application/json")
+        st.download_button("Export Prometheus", to_prometheus(), file_name="metrics.prom", mime="text/plain")
@@ -0,0 +1,64 @@
+"""Bulk scholarship issuance from CSV or Parquet files.
+
+A file needs a `student` and an `amount` column. Every row is validated in
+one vectorized pass; rows that fail are reported with a reason and the rest
+are issued together, or not at all if the admin balance can't cover them.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+
+def read_issuances(source, filename=None):
+    name = filename or getattr(source, 'name', None) or str(source)
+    if os.path.splitext(name)[1].lower() == '.parquet':
+        frame = pd.read_parquet(source)
+    else:
+        frame = pd.read_csv(source, dtype={'student': str})
+    frame.columns = [str(column).strip().lower() for column in frame.columns]
+    missing = {'student', 'amount'} - set(frame.columns)
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(sorted(missing))}")
+    return frame[['student', 'amount']]
+
+
+def validate_issuances(frame, reserved_accounts, max_amount=None):
+    """Split a (student, amount) frame into accepted rows and per-row rejections.
+
+    Amounts above max_amount (the admin balance) are rejected, as is anything
+    that wouldn't fit the ledger's int64 columns.
+    """
+    students = frame['student'].astype('string').str.strip()
+    amounts = pd.to_numeric(frame['amount'], errors='coerce')
+    limit = np.iinfo(np.int64).max if max_amount is None else min(max_amount, np.iinfo(np.int64).max)
+
+    reasons = np.select(
+        [
+            students.isna().to_numpy() | (students == '').fillna(False).to_numpy(),
+            students.isin(reserved_accounts).fillna(False).to_numpy(),
+            amounts.isna().to_numpy(),
+            (amounts <= 0).to_numpy(),
+            (amounts % 1 != 0).to_numpy(),
+            # Compared as float so huge values are caught before the int64 cast below can wrap them.
+            (amounts.astype(float) > float(limit)).to_numpy(),
+        ],
+        [
+            "Missing student",
+            "Cannot issue to Admin or vendor accounts",
+            "Amount is not a number",
+            "Amount must be positive",
+            "Amount must be a whole number",
+            f"Amount exceeds {limit}",
+        ],
+        default='',
+    )
+    rejected = reasons != ''
+    accepted = pd.DataFrame({'student': students[~rejected], 'amount': amounts[~rejected].astype(np.int64)})
+    rejections = pd.DataFrame({
+        'row': np.flatnonzero(rejected) + 1,
+        'student': frame['student'][rejected].to_numpy(),
+        'amount': frame['amount'][rejected].to_numpy(),
+        'reason': reasons[rejected],
+    })
+    return accepted, rejections
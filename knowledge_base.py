@@ -0,0 +1,153 @@
+"""Offline retrieval over the Ethereum documents in knowledge/.
+
+Markdown, text, PDF and DOCX files are split into overlapping chunks and
+indexed for BM25. The postings are stored CSR-style in .npy files (term
+offsets, chunk ids, term frequencies) and memory-mapped when loaded, so a
+query touches only the postings of its own terms. The index is rebuilt
+whenever a source file is added, removed or modified.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+
+KNOWLEDGE_DIR = os.environ.get('ETHCASH_KNOWLEDGE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'knowledge'))
+INDEX_DIR = os.path.join(os.environ.get('ETHCASH_DATA_DIR', 'ethcash_data'), 'knowledge_index')
+EXTENSIONS = ('.md', '.markdown', '.txt', '.pdf', '.docx')
+
+K1 = 1.5
+B = 0.75
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+def read_document(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.pdf':
+        from PyPDF2 import PdfReader
+        return "\n".join(page.extract_text() or '' for page in PdfReader(path).pages)
+    if extension == '.docx':
+        import docx
+        return "\n".join(paragraph.text for paragraph in docx.Document(path).paragraphs)
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def chunk_text(text, words=120, overlap=30):
+    tokens = text.split()
+    step = words - overlap
+    return [' '.join(tokens[start:start + words]) for start in range(0, max(len(tokens) - overlap, 1), step)]
+
+
+def source_files(source_dir):
+    return sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(source_dir)
+        for name in names if name.lower().endswith(EXTENSIONS)
+    )
+
+
+def fingerprint(source_dir):
+    digest = hashlib.sha256()
+    for path in source_files(source_dir):
+        stat = os.stat(path)
+        digest.update(f"{os.path.relpath(path, source_dir)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def build_index(source_dir=KNOWLEDGE_DIR, index_dir=INDEX_DIR):
+    chunks = []
+    for path in source_files(source_dir):
+        title = os.path.splitext(os.path.basename(path))[0].replace('_', ' ').title()
+        for chunk in chunk_text(read_document(path)):
+            chunks.append({'title': title, 'snippet': chunk, 'source': os.path.relpath(path, source_dir)})
+
+    vocabulary = {}
+    term_ids, chunk_ids, lengths = [], [], []
+    for chunk_id, chunk in enumerate(chunks):
+        tokens = tokenize(f"{chunk['title']} {chunk['snippet']}")
+        lengths.append(len(tokens))
+        term_ids.extend(vocabulary.setdefault(token, len(vocabulary)) for token in tokens)
+        chunk_ids.extend([chunk_id] * len(tokens))
+
+    # Unique (term, chunk) pairs sorted by term give the postings lists back to back.
+    stride = max(len(chunks), 1)
+    pairs, frequencies = np.unique(np.asarray(term_ids, dtype=np.int64) * stride + np.asarray(chunk_ids, dtype=np.int64),
+                                   return_counts=True)
+    posting_terms = pairs // stride
+    offsets = np.searchsorted(posting_terms, np.arange(len(vocabulary) + 1))
+    document_frequency = np.diff(offsets)
+    idf = np.log1p((len(chunks) - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    staging = index_dir + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    np.save(os.path.join(staging, 'offsets.npy'), offsets.astype(np.int64))
+    np.save(os.path.join(staging, 'postings.npy'), (pairs % stride).astype(np.int32))
+    np.save(os.path.join(staging, 'frequencies.npy'), frequencies.astype(np.float32))
+    np.save(os.path.join(staging, 'lengths.npy'), np.asarray(lengths, dtype=np.float32))
+    np.save(os.path.join(staging, 'idf.npy'), idf.astype(np.float32))
+    with open(os.path.join(staging, 'vocabulary.json'), 'w') as f:
+        json.dump(vocabulary, f)
+    with open(os.path.join(staging, 'chunks.json'), 'w') as f:
+        json.dump(chunks, f)
+    with open(os.path.join(staging, 'manifest.json'), 'w') as f:
+        json.dump({'fingerprint': fingerprint(source_dir), 'chunks': len(chunks), 'terms': len(vocabulary)}, f)
+    shutil.rmtree(index_dir, ignore_errors=True)
+    os.replace(staging, index_dir)
+
+
+class KnowledgeBase:
+    def __init__(self, index_dir=INDEX_DIR):
+        load = lambda name: np.load(os.path.join(index_dir, name), mmap_mode='r')
+        self.offsets = load('offsets.npy')
+        self.postings = load('postings.npy')
+        self.frequencies = load('frequencies.npy')
+        self.idf = load('idf.npy')
+        lengths = np.load(os.path.join(index_dir, 'lengths.npy'))
+        # The length-normalization term of BM25 depends only on the chunk, so compute it once.
+        self._norm = K1 * (1 - B + B * lengths / max(float(lengths.mean()), 1.0)) if len(lengths) else lengths
+        with open(os.path.join(index_dir, 'vocabulary.json')) as f:
+            self.vocabulary = json.load(f)
+        with open(os.path.join(index_dir, 'chunks.json')) as f:
+            self.chunks = json.load(f)
+        with open(os.path.join(index_dir, 'manifest.json')) as f:
+            self.version = json.load(f)['fingerprint']
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def search(self, query, k=4):
+        """Top-k chunks for `query` by BM25, as Cohere `documents` dicts (title, snippet)."""
+        terms = [self.vocabulary[token] for token in set(tokenize(query)) if token in self.vocabulary]
+        if not terms or not self.chunks:
+            return []
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for term in terms:
+            start, end = self.offsets[term], self.offsets[term + 1]
+            chunk_ids = self.postings[start:end]
+            frequencies = self.frequencies[start:end]
+            scores[chunk_ids] += self.idf[term] * frequencies * (K1 + 1) / (frequencies + self._norm[chunk_ids])
+        top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [{'title': self.chunks[i]['title'], 'snippet': self.chunks[i]['snippet']}
+                for i in top.tolist() if scores[i] > 0]
+
+
+def open_knowledge_base(source_dir=KNOWLEDGE_DIR, index_dir=INDEX_DIR):
+    """Load the index, rebuilding it first if the source documents changed."""
+    manifest = os.path.join(index_dir, 'manifest.json')
+    current = None
+    if os.path.exists(manifest):
+        with open(manifest) as f:
+            current = json.load(f)['fingerprint']
+    if current != fingerprint(source_dir):
+        build_index(source_dir, index_dir)
+    return KnowledgeBase(index_dir)
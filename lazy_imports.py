@@ -0,0 +1,32 @@
+"""Deferred imports for modules that only some code paths need.
+
+    knowledge_base = lazy_import('knowledge_base')
+
+returns a stand-in right away and runs the real import on first attribute
+access, so a page that never reaches that feature never pays for the
+module or its dependencies. The stand-in stays out of sys.modules until
+then; importlib.util.LazyLoader registers the module up front, and
+inspect.getmodule(), which Streamlit calls, touches every registered
+module and would trigger the import anyway.
+"""
+import importlib
+
+
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute):
+        if self._module is None:
+            # import_module holds the import lock, so concurrent first uses import once.
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
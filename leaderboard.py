@@ -0,0 +1,114 @@
+"""Process-wide, persistent leaderboards for the Solidity games.
+
+Each board keeps every player's best score in SQLite and mirrors it in
+memory as a list sorted by (-points, name), so a player's rank is a
+bisect (O(log n)) and the top K is a slice. The top-K slice is cached
+until the next score change. Scores are written to SQLite in batches by a
+background thread rather than on every submission.
+
+Open boards through open_leaderboard, which returns the same board for
+repeated calls in one process.
+"""
+import atexit
+import os
+import sqlite3
+import threading
+from bisect import bisect_left, insort
+
+LEADERBOARD_PATH = os.path.join(os.environ.get('ETHCASH_DATA_DIR', 'ethcash_data'), 'leaderboard.sqlite3')
+
+
+class Leaderboard:
+    def __init__(self, game, path=LEADERBOARD_PATH, flush_interval=1.0):
+        self.game = game
+        self.flush_interval = flush_interval
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS scores "
+            "(game TEXT NOT NULL, name TEXT NOT NULL, points INTEGER NOT NULL, PRIMARY KEY (game, name))"
+        )
+        self._db.commit()
+        rows = self._db.execute("SELECT name, points FROM scores WHERE game = ?", (game,)).fetchall()
+        self._best = dict(rows)
+        self._ranking = sorted((-points, name) for name, points in rows)
+        self._pending = {}
+        self._version = 0
+        self._top = (None, 0, [])
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._writer = threading.Thread(target=self._run, name=f"leaderboard-{game}", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def __len__(self):
+        return len(self._ranking)
+
+    def submit(self, name, points):
+        """Record a finished game; only a player's best score counts."""
+        with self._lock:
+            best = self._best.get(name)
+            if best is not None and points <= best:
+                return
+            if best is not None:
+                del self._ranking[bisect_left(self._ranking, (-best, name))]
+            insort(self._ranking, (-points, name))
+            self._best[name] = points
+            self._pending[name] = points
+            self._version += 1
+
+    def top(self, k=10):
+        """The k best (name, points), best first."""
+        version, cached_k, entries = self._top
+        if version == self._version and cached_k >= k:
+            return entries[:k]
+        with self._lock:
+            entries = [(name, -negative) for negative, name in self._ranking[:k]]
+            self._top = (self._version, k, entries)
+        return entries
+
+    def rank(self, name):
+        """The player's 1-based rank and best points, or None if they haven't finished a game."""
+        with self._lock:
+            points = self._best.get(name)
+            if points is None:
+                return None
+            return bisect_left(self._ranking, (-points, name)) + 1, points
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        with self._db_lock:
+            self._db.executemany(
+                "INSERT INTO scores (game, name, points) VALUES (?, ?, ?) "
+                "ON CONFLICT (game, name) DO UPDATE SET points = MAX(points, excluded.points)",
+                [(self.game, name, points) for name, points in pending.items()]
+            )
+            self._db.commit()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self.flush()
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self.flush()
+
+
+_boards = {}
+_boards_lock = threading.Lock()
+
+
+def open_leaderboard(game, path=None):
+    path = os.path.abspath(path or LEADERBOARD_PATH)
+    with _boards_lock:
+        if (path, game) not in _boards:
+            _boards[(path, game)] = Leaderboard(game, path)
+        return _boards[(path, game)]
@@ -0,0 +1,544 @@
+import hashlib
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from contextlib import ExitStack, contextmanager
+from itertools import islice
+
+import numpy as np
+
+from columnar import TransactionStore
+from issuance import validate_issuances
+from merkle import MerkleAccumulator, leaf_hash
+from policy import load_policy
+from zkp import (DEFAULT_ENGINE, EnhancedZKProof, get_key_pool, get_process_pool,
+                 serialize_private_key, sign_batch)
+
+
+class BalanceCheckpoints:
+    """Every account's balances, captured every `every` journal entries.
+
+    A point-in-time lookup bisects to the nearest checkpoint and only folds
+    in the entries after it, so it never scans the whole journal.
+    """
+
+    def __init__(self, every=4096):
+        self.every = every
+        self.seqs = []
+        self.known = []
+        self.balances = []
+        self.frozen_balances = []
+
+    def balances_at(self, store, end):
+        """Return (known, balances, frozen_balances) by account code over entries before seq `end`."""
+        count = len(store.accounts.values)
+        known = np.zeros(count, dtype=bool)
+        balances = np.zeros(count, dtype=np.int64)
+        frozen_balances = np.zeros(count, dtype=np.int64)
+        start = 0
+        i = bisect_right(self.seqs, end) - 1
+        if i >= 0:
+            start = self.seqs[i]
+            size = len(self.known[i])
+            known[:size] = self.known[i]
+            balances[:size] = self.balances[i]
+            frozen_balances[:size] = self.frozen_balances[i]
+
+        codes = store.account_codes[start:end]
+        if len(codes):
+            # The first hit in the reversed tail is each account's latest entry.
+            found, reversed_index = np.unique(codes[::-1], return_index=True)
+            latest = end - 1 - reversed_index
+            known[found] = True
+            balances[found] = store.balances[latest]
+            frozen_balances[found] = store.frozen_balances[latest]
+        return known, balances, frozen_balances
+
+    def rebuild(self, store):
+        """Recompute every checkpoint from the store, e.g. after loading a snapshot.
+
+        Each checkpoint folds in only the entries since the previous one, so
+        this is a single pass over the journal.
+        """
+        self.seqs, self.known, self.balances, self.frozen_balances = [], [], [], []
+        for end in range(self.every, len(store) + 1, self.every):
+            known, balances, frozen_balances = self.balances_at(store, end)
+            self.seqs.append(end)
+            self.known.append(known)
+            self.balances.append(balances)
+            self.frozen_balances.append(frozen_balances)
+
+    def to_arrays(self):
+        """The checkpoints as padded 2-D arrays plus each row's width, for saving in a snapshot."""
+        widths = np.array([len(known) for known in self.known], dtype=np.int64)
+        width = int(widths.max()) if len(widths) else 0
+        arrays = {'seqs': np.array(self.seqs, dtype=np.int64), 'widths': widths}
+        for name, dtype in (('known', bool), ('balances', np.int64), ('frozen_balances', np.int64)):
+            padded = np.zeros((len(widths), width), dtype=dtype)
+            for i, row in enumerate(getattr(self, name)):
+                padded[i, :len(row)] = row
+            arrays[name] = padded
+        return arrays
+
+    def load_arrays(self, arrays):
+        """Restore checkpoints saved with to_arrays."""
+        self.seqs = arrays['seqs'].tolist()
+        widths = arrays['widths'].tolist()
+        for name in ('known', 'balances', 'frozen_balances'):
+            setattr(self, name, [arrays[name][i, :width] for i, width in enumerate(widths)])
+
+    def record(self, store):
+        end = len(store)
+        if end % self.every == 0:
+            known, balances, frozen_balances = self.balances_at(store, end)
+            self.seqs.append(end)
+            self.known.append(known)
+            self.balances.append(balances)
+            self.frozen_balances.append(frozen_balances)
+
+
+def transaction_id(account, seq, timestamp, amount, to_address):
+    """SHA-256 transaction ID over the sender, the global seq and the journal timestamp.
+
+    The seq is unique across the whole journal, so two accounts making the same
+    payment at the same per-account nonce no longer share an ID.
+    """
+    return hashlib.sha256(f"{account}\x00{seq}\x00{timestamp!r}\x00{amount}\x00{to_address}".encode()).digest()
+
+
+class TransactionJournal:
+    """System-wide append-only transaction log.
+
+    An entry's sequence number is its row in the columnar store, so the
+    journal is always in order. Per-account views and time-range filters
+    are served from the sorted seq and time indexes, never by sorting, and
+    a transaction is found by its hash through the by_hash index, which
+    is built on the first lookup after a snapshot load.
+    """
+
+    def __init__(self):
+        self.store = TransactionStore()
+        self.by_account = {}
+        # digest -> seq; set to None after a snapshot load and rebuilt by the first lookup.
+        self.by_hash = {}
+        self.checkpoints = BalanceCheckpoints()
+        self.merkle = MerkleAccumulator()
+        self.wal = None
+        # Guards appends (and atomic groups of them); balances are protected by per-account locks.
+        self.lock = threading.RLock()
+        self._group_depth = 0
+
+    @contextmanager
+    def atomic(self):
+        """Make the appends inside one all-or-nothing write-ahead-log entry.
+
+        Holds the journal lock throughout, so take the account locks first and
+        don't acquire new ones inside.
+        """
+        with self.lock:
+            self._group_depth += 1
+            if self._group_depth == 1 and self.wal is not None:
+                self.wal.begin_group()
+            try:
+                yield
+            finally:
+                self._group_depth -= 1
+                if self._group_depth == 0 and self.wal is not None:
+                    self.wal.end_group()
+
+    def append(self, account, amount, description, balance, frozen_balance, tx_hash=None, purpose=None,
+               timestamp=None, to_address=None):
+        """Record an entry and return its seq; without a tx_hash one is derived with transaction_id."""
+        with self.lock:
+            # Clamp to keep times sorted even if the wall clock steps backwards.
+            now = time.time() if timestamp is None else timestamp
+            if len(self.store):
+                now = max(now, float(self.store.timestamps[len(self.store) - 1]))
+            if tx_hash is None:
+                tx_hash = transaction_id(account, len(self.store), now, amount, to_address)
+            seq = self.store.append(now, account, amount, description, balance, frozen_balance, tx_hash, purpose)
+            self.by_account.setdefault(account, []).append(seq)
+            # Ledgers written before IDs included the seq can repeat a hash; keep the first entry.
+            if self.by_hash is not None:
+                self.by_hash.setdefault(tx_hash, seq)
+            self.checkpoints.record(self.store)
+            self.merkle.append(leaf_hash(seq, account, amount, balance, frozen_balance, tx_hash))
+            if self.wal is not None:
+                self.wal.append(seq, now, account, amount, description, balance, frozen_balance, tx_hash, purpose)
+            return seq
+
+    def __len__(self):
+        return len(self.store)
+
+    def frame(self, seqs=None, columns=None):
+        return self.store.frame(seqs, columns)
+
+    def find_seq(self, tx_hash):
+        """Seq of the first entry with this hex tx_hash, or None (also for non-hex input)."""
+        try:
+            digest = bytes.fromhex(tx_hash)
+        except ValueError:
+            return None
+        by_hash = self.by_hash
+        if by_hash is None:
+            with self.lock:
+                if self.by_hash is None:
+                    self.reindex()
+                by_hash = self.by_hash
+        return by_hash.get(digest)
+
+    def reindex(self):
+        """Build by_hash from the store; call with the lock held."""
+        count = len(self.store)
+        digests = self.store.hashes[:count].tobytes()
+        by_hash = {}
+        for seq in range(count):
+            by_hash.setdefault(digests[seq * 32:(seq + 1) * 32], seq)
+        self.by_hash = by_hash
+
+    def seq_at(self, when):
+        """Number of entries recorded at or before epoch time `when`."""
+        return int(np.searchsorted(self.store.timestamps[:len(self.store)], when, side='right'))
+
+    def balance_as_of(self, account, when):
+        """(balance, frozen_balance) of one account at `when`, or None if it had no entries yet."""
+        seqs = self.by_account.get(account, [])
+        i = bisect_left(seqs, self.seq_at(when)) - 1
+        if i < 0:
+            return None
+        return int(self.store.balances[seqs[i]]), int(self.store.frozen_balances[seqs[i]])
+
+    def balances_as_of(self, when):
+        """{account: (balance, frozen_balance)} at `when` for every account with entries by then."""
+        known, balances, frozen_balances = self.checkpoints.balances_at(self.store, self.seq_at(when))
+        return {name: (int(balances[code]), int(frozen_balances[code]))
+                for code, name in enumerate(self.store.accounts.values[:len(known)]) if known[code]}
+
+    def iter_seqs(self, account=None, start=None, end=None, before=None):
+        """Yield matching sequence numbers newest first.
+
+        start/end are epoch seconds (inclusive); before is an exclusive seq cursor.
+        """
+        times = self.store.timestamps[:len(self.store)]
+        lo = 0 if start is None else int(np.searchsorted(times, start, side='left'))
+        hi = len(times) if end is None else int(np.searchsorted(times, end, side='right'))
+        if before is not None:
+            hi = min(hi, before)
+        if account is None:
+            return iter(range(hi - 1, lo - 1, -1))
+        seqs = self.by_account.get(account, [])
+        return (seqs[i] for i in range(bisect_left(seqs, hi) - 1, bisect_left(seqs, lo) - 1, -1))
+
+    def page(self, limit=50, before=None, account=None, start=None, end=None, columns=None):
+        """Return (frame, next_cursor) for one newest-first page."""
+        seqs = list(islice(self.iter_seqs(account, start, end, before), limit + 1))
+        next_cursor = seqs[limit - 1] if len(seqs) > limit else None
+        seqs = seqs[:limit]
+        return self.frame(seqs, columns), next_cursor
+
+
+class EthereumAccount:
+    def __init__(self, name, balance=0, engine=None, journal=None):
+        self.name = name
+        self.balance = balance
+        self.opening_balance = balance
+        self.frozen_balance = 0
+        self.nonce = 0
+        self.journal = journal if journal is not None else TransactionJournal()
+        self.engine = engine or DEFAULT_ENGINE
+        self.lock = threading.RLock()
+        self._keys = None
+
+    @property
+    def transactions(self):
+        return [self.journal.store.row(seq) for seq in self.journal.by_account.get(self.name, [])]
+
+    def transactions_frame(self, columns=None):
+        return self.journal.frame(self.journal.by_account.get(self.name, []), columns)
+
+    # Keys are drawn from the pre-generated pool on first signature, not at account creation.
+    @property
+    def keys(self):
+        if self._keys is None:
+            with self.lock:
+                if self._keys is None:
+                    self._keys = get_key_pool(self.engine).acquire()
+        return self._keys
+
+    @property
+    def private_key(self):
+        return self.keys[0]
+
+    @property
+    def public_key(self):
+        return self.keys[1]
+
+    @property
+    def private_key_der(self):
+        if getattr(self, '_key_der', None) is None:
+            self._key_der = serialize_private_key(self.private_key)
+        return self._key_der
+
+    def add_transaction(self, amount, description, to_address, is_frozen=False, purpose=None):
+        with self.lock:
+            balance, frozen_balance = self.balance, self.frozen_balance
+            if is_frozen:
+                frozen_balance += amount
+            else:
+                balance += amount
+            # Only move the account once the journal has accepted the entry.
+            seq = self.journal.append(self.name, amount, description, balance, frozen_balance,
+                                      purpose=purpose, to_address=to_address)
+            self.balance, self.frozen_balance = balance, frozen_balance
+            self.nonce += 1
+            return self.journal.store.hashes[seq].tobytes().hex()
+
+class EthereumScholarshipSystem:
+    def __init__(self, engine=None, policy=None):
+        self.engine = engine
+        self.wal = None
+        self.journal = TransactionJournal()
+        self._accounts_lock = threading.Lock()
+        self.accounts = {
+            'Admin': EthereumAccount('Admin', 1000000, engine, self.journal),
+            'Student1': EthereumAccount('Student1', engine=engine, journal=self.journal),
+            'Student2': EthereumAccount('Student2', engine=engine, journal=self.journal),
+            'Vendor1': EthereumAccount('Vendor1', engine=engine, journal=self.journal),
+            'Vendor2': EthereumAccount('Vendor2', engine=engine, journal=self.journal)
+        }
+        self.zkp = EnhancedZKProof()
+        self.policy = policy or load_policy()
+        self.approved_vendors = set(self.policy.vendors)
+        self.educational_purposes = self.policy.educational_purposes
+        self.disallowed_purposes = self.policy.disallowed_purposes
+        self.spending_limits = self.policy.spending_limits
+
+    def add_account(self, name, balance=0):
+        # Copy-on-write: the dict other sessions may be iterating is never mutated, only replaced.
+        if name not in self.accounts:
+            with self._accounts_lock:
+                if name not in self.accounts:
+                    accounts = dict(self.accounts)
+                    accounts[name] = EthereumAccount(name, balance, self.engine, self.journal)
+                    self.accounts = accounts
+        return self.accounts[name]
+
+    def add_accounts(self, names):
+        """add_account for many names with a single copy of the accounts dict."""
+        with self._accounts_lock:
+            new = [name for name in dict.fromkeys(names) if name not in self.accounts]
+            if new:
+                accounts = dict(self.accounts)
+                for name in new:
+                    accounts[name] = EthereumAccount(name, 0, self.engine, self.journal)
+                self.accounts = accounts
+        return [self.accounts[name] for name in names]
+
+    @contextmanager
+    def locked(self, *names):
+        """Hold the locks of the named accounts, always acquired in the same order.
+
+        Admin sorts first so bulk issuance can keep holding it while it locks students.
+        """
+        with ExitStack() as stack:
+            for name in sorted(set(names), key=lambda name: (name != 'Admin', name)):
+                stack.enter_context(self.accounts[name].lock)
+            yield
+
+    def student_names(self):
+        return [name for name in self.accounts if name != 'Admin' and name not in self.approved_vendors]
+
+    def commit(self):
+        # Wait until this operation's transactions are durable (no-op without a write-ahead log).
+        if self.wal is not None:
+            self.wal.commit(self)
+
+    def _issue(self, student, amount):
+        with self.journal.atomic():
+            tx_hash = self.accounts['Admin'].add_transaction(-amount, f"Issue scholarship to {student}", student)
+            self.accounts[student].add_transaction(amount, "Receive scholarship", 'Admin', is_frozen=True)
+        return tx_hash
+
+    def issue_scholarship(self, student, amount):
+        with self.locked('Admin', student):
+            if self.accounts['Admin'].balance < amount:
+                return None
+            tx_hash = self._issue(student, amount)
+        self.commit()
+        return tx_hash
+
+    def issue_scholarships(self, frame):
+        """Issue scholarships for a whole cohort from a (student, amount) frame.
+
+        Invalid rows are rejected individually; the remaining rows are issued
+        together, creating student accounts as needed, or not at all if their
+        total exceeds the admin balance. Returns (tx_hashes, rejections, message).
+        """
+        accepted, rejections = validate_issuances(frame, {'Admin'} | self.approved_vendors,
+                                                  self.accounts['Admin'].balance)
+        total = int(accepted['amount'].sum())
+        with self.locked('Admin'):
+            admin_balance = self.accounts['Admin'].balance
+            if total > admin_balance:
+                return [], rejections, f"Total of {total} exceeds admin balance of {admin_balance}. Nothing was issued."
+
+            # One copy of the accounts dict for the whole cohort, not one per new student.
+            self.add_accounts(accepted['student'].unique().tolist())
+            tx_hashes = []
+            for student, amount in zip(accepted['student'].tolist(), accepted['amount'].tolist()):
+                with self.locked(student):
+                    tx_hashes.append(self._issue(student, amount))
+        self.commit()
+        return tx_hashes, rejections, f"Issued {total} to {len(tx_hashes)} student(s); {len(rejections)} row(s) rejected."
+
+    def check_spend(self, student, vendor, amount, purpose):
+        return self.policy.check(student, vendor, amount, purpose)
+
+    def rebuild_spending_totals(self):
+        """Recompute the policy's per-period totals from the students' spends in the journal."""
+        store = self.journal.store
+        count = len(store)
+        spends = (store.purpose_codes[:count] >= 0) & (store.amounts[:count] < 0)
+        self.policy.load_totals(
+            np.asarray(store.accounts.values, dtype=object)[store.account_codes[:count][spends]],
+            np.asarray(store.purposes.values, dtype=object)[store.purpose_codes[:count][spends]],
+            -store.amounts[:count][spends],
+            store.timestamps[:count][spends]
+        )
+
+    @staticmethod
+    def spend_payload(student, vendor, amount, purpose, nonce):
+        # Binding the proof to the student's nonce makes it valid for exactly one ledger state.
+        return f"{student}{vendor}{amount}{purpose}:{nonce}"
+
+    def _sign_spend(self, student, vendor, amount, purpose, nonce):
+        account = self.accounts[student]
+        public = self.spend_payload(student, vendor, amount, purpose, nonce)
+        proof = self.zkp.generate_proof(account.private_key, public)
+        return proof if self.zkp.verify_proof(account.public_key, proof, public) else None
+
+    def _apply_spend(self, student, vendor, amount, purpose, proof):
+        # Caller holds the student and vendor locks.
+        if proof is None or self.accounts[student].frozen_balance < amount:
+            return None, None, "Insufficient frozen funds or invalid proof"
+        # Re-checked under the student's lock so concurrent spends can't both fit under the period limit.
+        error = self.check_spend(student, vendor, amount, purpose)
+        if error:
+            return None, None, error
+        with self.journal.atomic():
+            tx_hash_student = self.accounts[student].add_transaction(-amount, f"Spend at {vendor}", vendor, is_frozen=True, purpose=purpose)
+            tx_hash_vendor = self.accounts[vendor].add_transaction(amount, f"Receive from {student}", student, purpose=purpose)
+        self.policy.record(student, purpose, amount)
+        return tx_hash_student, proof, "Transaction successful"
+
+    def spend_scholarship(self, student, vendor, amount, purpose, retries=3):
+        error = self.check_spend(student, vendor, amount, purpose)
+        if error:
+            return None, None, error
+
+        # Sign outside the locks, then apply only if no other transaction moved the nonce meanwhile.
+        account = self.accounts[student]
+        for _ in range(retries):
+            nonce = account.nonce
+            proof = self._sign_spend(student, vendor, amount, purpose, nonce)
+            with self.locked(student, vendor):
+                if account.nonce != nonce:
+                    continue
+                result = self._apply_spend(student, vendor, amount, purpose, proof)
+            self.commit()
+            return result
+        return None, None, "Account is busy, please retry"
+
+    def spend_scholarships(self, spends, executor=None):
+        """Spend many (student, vendor, amount, purpose) tuples at once.
+
+        Proofs are signed and verified on a process pool, one task per student,
+        then balance updates are applied in the order the spends were given.
+        Each proof is signed for the nonce its spend is expected to run at;
+        spends whose nonce moved in the meantime are re-signed inline.
+        Returns one (tx_hash, proof, message) result per spend; spends the
+        policy rejects or that name unknown accounts get a message and no hash.
+        """
+        results = [None] * len(spends)
+        payloads = {}
+        accounts = self.accounts
+        errors = self.policy.check_batch(*(list(column) for column in zip(*spends))) if spends else []
+        for i, ((student, vendor, amount, purpose), error) in enumerate(zip(spends, errors)):
+            if not error and student not in accounts:
+                error = f"Unknown student '{student}'"
+            elif not error and vendor not in accounts:
+                error = f"Unknown vendor '{vendor}'"
+            if error:
+                results[i] = (None, None, error)
+            else:
+                items = payloads.setdefault(student, [])
+                nonce = self.accounts[student].nonce + len(items)
+                items.append((i, nonce, self.spend_payload(student, vendor, amount, purpose, nonce)))
+
+        executor = executor or get_process_pool()
+        futures = {
+            student: executor.submit(sign_batch, self.accounts[student].private_key_der, [public for _, _, public in items])
+            for student, items in payloads.items()
+        }
+        # The worker has already verified each signature; nothing checks these proofs again,
+        # since every proof is bound to a nonce.
+        proofs = {}
+        for student, future in futures.items():
+            for (i, nonce, public), (signature, valid) in zip(payloads[student], future.result()):
+                proofs[i] = (nonce, signature if valid else None)
+
+        for i in sorted(proofs):
+            student, vendor, amount, purpose = spends[i]
+            nonce, proof = proofs[i]
+            with self.locked(student, vendor):
+                if self.accounts[student].nonce != nonce:
+                    proof = self._sign_spend(student, vendor, amount, purpose, self.accounts[student].nonce)
+                results[i] = self._apply_spend(student, vendor, amount, purpose, proof)
+        self.commit()
+        return results
+
+    def balance_as_of(self, account, when):
+        found = self.journal.balance_as_of(account, when)
+        return found if found is not None else (self.accounts[account].opening_balance, 0)
+
+    def balances_as_of(self, when):
+        found = self.journal.balances_as_of(when)
+        return {name: found.get(name, (account.opening_balance, 0)) for name, account in self.accounts.items()}
+
+    def merkle_root(self):
+        # Under the journal lock: mid-append, a parent node may not be written yet.
+        with self.journal.lock:
+            return self.journal.merkle.root().hex()
+
+    def find_transaction(self, tx_hash):
+        """The journal row for a hex transaction hash, or None if it isn't in the ledger."""
+        seq = self.journal.find_seq(tx_hash)
+        return None if seq is None else self.journal.store.row(seq)
+
+    def prove_transaction(self, tx_hash):
+        """Return (row, inclusion proof, hex root) for a transaction, or None if it isn't in the ledger.
+
+        The proof and root are taken together under the journal lock, so appends
+        from other sessions can't make them disagree. Check the result with
+        merkle.verify_transaction(row, proof, root).
+        """
+        seq = self.journal.find_seq(tx_hash)
+        if seq is None:
+            return None
+        with self.journal.lock:
+            proof = self.journal.merkle.proof(seq)
+            root = self.journal.merkle.root(proof['size'])
+        return self.journal.store.row(seq), proof, root.hex()
+
+    def get_all_transactions(self):
+        return self.journal.frame(np.arange(len(self.journal) - 1, -1, -1))
+
+    def transfer_scholarship(self, from_student, to_student, amount):
+        with self.locked(from_student, to_student):
+            if self.accounts[from_student].frozen_balance < amount:
+                return None
+            with self.journal.atomic():
+                tx_hash_from = self.accounts[from_student].add_transaction(-amount, f"Transfer to {to_student}", to_student, is_frozen=True)
+                tx_hash_to = self.accounts[to_student].add_transaction(amount, f"Receive from {from_student}", from_student, is_frozen=True)
+        self.commit()
+        return tx_hash_from
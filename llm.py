@@ -0,0 +1,276 @@
+"""Process-wide gateway for the pages that call Cohere.
+
+Every page shares one client with a pooled HTTP connection. Calls go
+through LLMGateway, which:
+
+- caps concurrent upstream calls,
+- gives each call a deadline, so a slow upstream fails the call instead of
+  pinning the Streamlit script thread; a stream must produce its first event
+  within the deadline and each later event within the deadline of the last,
+- retries transient failures with exponential backoff and full jitter,
+- coalesces identical in-flight chat/generate requests into a single
+  upstream call (single flight).
+
+The Cohere backend needs COHERE_API_KEY. Set ETHCASH_LLM_BACKEND=stub to run
+without network access or an API key; StubClient answers with canned text
+and records its calls.
+"""
+import hashlib
+import json
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from types import SimpleNamespace
+
+from instrumentation import count, timer
+
+LLM_BACKEND = os.environ.get('ETHCASH_LLM_BACKEND', 'cohere')
+COHERE_API_KEY = os.environ.get('COHERE_API_KEY')
+MAX_CONCURRENCY = int(os.environ.get('ETHCASH_LLM_CONCURRENCY', '8'))
+DEADLINE = float(os.environ.get('ETHCASH_LLM_DEADLINE', '30'))
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class LLMTimeout(TimeoutError):
+    pass
+
+
+class StubClient:
+    """Offline stand-in for cohere.Client's chat and generate calls.
+
+    `latency` delays every call, `stream_latency` every streamed event after
+    the first, and the first `failures` calls raise ConnectionError, for
+    exercising the gateway's deadlines and retries.
+    """
+
+    def __init__(self, replies=None, latency=0.0, failures=0, stream_latency=0.0):
+        self.replies = replies or {}
+        self.latency = latency
+        self.stream_latency = stream_latency
+        self.failures = failures
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _call(self, kind, text, kwargs):
+        with self._lock:
+            self.calls.append((kind, text, kwargs))
+            fail = self.failures > 0
+            self.failures -= fail
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise ConnectionError("stub failure")
+
+    def chat(self, message, **kwargs):
+        self._call('chat', message, kwargs)
+        return SimpleNamespace(text=self.replies.get(message, f"(offline) You asked: {message}"))
+
+    def chat_stream(self, message, **kwargs):
+        text = self.chat(message, **kwargs).text
+        for i, word in enumerate(text.split(' ')):
+            if i and self.stream_latency:
+                time.sleep(self.stream_latency)
+            yield SimpleNamespace(event_type='text-generation', text=word if i == 0 else ' ' + word)
+        yield SimpleNamespace(event_type='stream-end', response=SimpleNamespace(text=text))
+
+    def generate(self, prompt, **kwargs):
+        self._call('generate', prompt, kwargs)
+        text = self.replies.get(prompt, f"(offline) {prompt}")
+        return SimpleNamespace(generations=[SimpleNamespace(text=text)])
+
+
+def is_retryable(error):
+    if getattr(error, 'status_code', None) in RETRYABLE_STATUS:
+        return True
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    # httpx transport errors (connect/read timeouts, resets) don't subclass the builtins.
+    return type(error).__module__.startswith('httpx') and type(error).__name__.endswith(('Error', 'Timeout'))
+
+
+def create_client(backend=None):
+    if (backend or LLM_BACKEND) == 'stub':
+        return StubClient()
+    if not COHERE_API_KEY:
+        raise RuntimeError("Set COHERE_API_KEY, or ETHCASH_LLM_BACKEND=stub to run offline")
+    import cohere
+    import httpx
+    pool = httpx.Client(
+        limits=httpx.Limits(max_connections=MAX_CONCURRENCY, max_keepalive_connections=MAX_CONCURRENCY),
+        timeout=DEADLINE,
+    )
+    return cohere.Client(COHERE_API_KEY, httpx_client=pool, max_retries=0)
+
+
+class LLMGateway:
+    def __init__(self, client=None, max_concurrency=MAX_CONCURRENCY, deadline=DEADLINE, retries=3, backoff=0.5,
+                 max_backoff=8.0, client_factory=create_client):
+        # Without a client, client_factory builds one on the first call, keeping cohere and httpx off page load.
+        self._client = client
+        self._client_factory = client_factory
+        self._client_lock = threading.Lock()
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        # Upstream calls run here so the caller can give up at its deadline; a call it abandons
+        # keeps its slot until the HTTP client's own timeout ends it.
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency * 2, thread_name_prefix='llm')
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._client_factory()
+        return self._client
+
+    def chat(self, deadline=None, **kwargs):
+        return self._coalesced('chat', kwargs, deadline)
+
+    def generate(self, deadline=None, **kwargs):
+        return self._coalesced('generate', kwargs, deadline)
+
+    def chat_stream(self, deadline=None, **kwargs):
+        """Stream chat events. Retries only happen before the first event.
+
+        The first event must arrive within the deadline and every later one
+        within the deadline of the one before; otherwise LLMTimeout is raised.
+        """
+        deadline = deadline or self.deadline
+        expires = time.monotonic() + deadline
+        for attempt in range(self.retries + 1):
+            self._acquire(expires)
+            # The upstream stream is read on the executor, so a stalled read can't hold the caller past the deadline.
+            events = queue.Queue()
+            cancelled = threading.Event()
+            self._executor.submit(self._pump, kwargs, events, cancelled)
+            started = False
+            try:
+                while True:
+                    try:
+                        kind, value = events.get(timeout=max(expires - time.monotonic(), 0))
+                    except queue.Empty:
+                        count('llm.timed_out')
+                        raise LLMTimeout("The language model stopped answering") from None
+                    if kind == 'end':
+                        return
+                    if kind == 'error':
+                        raise value
+                    started = True
+                    expires = time.monotonic() + deadline
+                    yield value
+            except LLMTimeout:
+                raise
+            except Exception as e:
+                if started or attempt == self.retries or not is_retryable(e):
+                    count('llm.failed')
+                    raise
+                count('llm.retried')
+                self._sleep(attempt, expires)
+            finally:
+                cancelled.set()
+
+    def _pump(self, kwargs, events, cancelled):
+        """Copy upstream stream events into `events` until it ends, fails or the reader gives up."""
+        try:
+            stream = self.client.chat_stream(**kwargs)
+            try:
+                for event in stream:
+                    if cancelled.is_set():
+                        break
+                    events.put(('event', event))
+            finally:
+                close = getattr(stream, 'close', None)
+                if close is not None:
+                    close()
+            events.put(('end', None))
+        except Exception as e:
+            events.put(('error', e))
+        finally:
+            self._slots.release()
+
+    def _coalesced(self, method, kwargs, deadline):
+        key = hashlib.sha256(f"{method}:{json.dumps(kwargs, sort_keys=True, default=str)}".encode()).digest()
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            count('llm.coalesced')
+            return self._wait(future, time.monotonic() + (deadline or self.deadline))
+        try:
+            result = self._call(method, kwargs, time.monotonic() + (deadline or self.deadline))
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+
+    def _call(self, method, kwargs, expires):
+        for attempt in range(self.retries + 1):
+            self._acquire(expires)
+            upstream = self._executor.submit(self._upstream, method, kwargs)
+            try:
+                return self._wait(upstream, expires)
+            except LLMTimeout:
+                raise
+            except Exception as e:
+                if attempt == self.retries or not is_retryable(e):
+                    count('llm.failed')
+                    raise
+                count('llm.retried')
+                self._sleep(attempt, expires)
+
+    def _upstream(self, method, kwargs):
+        try:
+            with timer(f"llm.{method}"):
+                return getattr(self.client, method)(**kwargs)
+        finally:
+            self._slots.release()
+
+    def _acquire(self, expires):
+        if not self._slots.acquire(timeout=max(expires - time.monotonic(), 0)):
+            count('llm.timed_out')
+            raise LLMTimeout("Too many LLM requests in flight")
+
+    def _wait(self, future, expires):
+        try:
+            return future.result(timeout=max(expires - time.monotonic(), 0))
+        except FutureTimeout:
+            if future.done():
+                raise  # the upstream call itself raised a TimeoutError
+            count('llm.timed_out')
+            raise LLMTimeout("The language model took too long to answer") from None
+
+    def _sleep(self, attempt, expires):
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        if time.monotonic() + delay >= expires:
+            count('llm.timed_out')
+            raise LLMTimeout("The language model took too long to answer")
+        time.sleep(delay)
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
@@ -0,0 +1,109 @@
+"""Incremental Merkle accumulator (a Merkle mountain range) over the journal.
+
+Leaves are appended in seq order and only complete, power-of-two subtrees
+are ever hashed, so an append touches O(log n) nodes. The root bags the
+current peaks right to left. An inclusion proof is the sibling path up to
+the leaf's peak plus the list of peaks, O(log n) hashes in total.
+"""
+import hashlib
+import struct
+
+LEAF = b'\x00'
+NODE = b'\x01'
+EMPTY_ROOT = hashlib.sha256(b'').digest()
+
+
+def leaf_hash(seq, account, amount, balance, frozen_balance, tx_hash):
+    return hashlib.sha256(
+        LEAF + struct.pack('<Qqqq', seq, amount, balance, frozen_balance) + tx_hash + account.encode()
+    ).digest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(NODE + left + right).digest()
+
+
+def bag_peaks(peaks):
+    if not peaks:
+        return EMPTY_ROOT
+    root = peaks[-1]
+    for peak in reversed(peaks[:-1]):
+        root = node_hash(peak, root)
+    return root
+
+
+class MerkleAccumulator:
+    def __init__(self):
+        # levels[h] holds every complete subtree root of height h, 32 bytes each.
+        self.levels = [bytearray()]
+
+    def __len__(self):
+        return len(self.levels[0]) // 32
+
+    def _node(self, height, index):
+        return bytes(self.levels[height][index * 32:(index + 1) * 32])
+
+    def append(self, leaf):
+        self.levels[0] += leaf
+        height = 0
+        # Every time a level gets an even count, its last two nodes close a subtree one level up.
+        while (len(self.levels[height]) // 32) % 2 == 0:
+            count = len(self.levels[height]) // 32
+            parent = node_hash(self._node(height, count - 2), self._node(height, count - 1))
+            if height + 1 == len(self.levels):
+                self.levels.append(bytearray())
+            self.levels[height + 1] += parent
+            height += 1
+
+    def peaks(self, size=None):
+        """Peaks of the first `size` leaves (all of them by default)."""
+        size = len(self) if size is None else size
+        return [self._node(height, (size >> height) - 1)
+                for height in range(len(self.levels) - 1, -1, -1) if (size >> height) & 1]
+
+    def root(self, size=None):
+        return bag_peaks(self.peaks(size))
+
+    def proof(self, index):
+        size = len(self)
+        if not 0 <= index < size:
+            raise IndexError(f"No leaf {index} in an accumulator of {size}")
+        peak_index, offset = 0, 0
+        for height in range(len(self.levels) - 1, -1, -1):
+            if (size >> height) & 1:
+                if index < offset + (1 << height):
+                    break
+                offset += 1 << height
+                peak_index += 1
+        siblings = []
+        for level in range(height):
+            node = index >> level
+            sibling = node ^ 1
+            siblings.append(['L' if sibling < node else 'R', self._node(level, sibling).hex()])
+        return {
+            'index': index,
+            'size': size,
+            'siblings': siblings,
+            # Same size as the sibling path, even if leaves were appended meanwhile.
+            'peaks': [peak.hex() for peak in self.peaks(size)],
+            'peak_index': peak_index,
+        }
+
+
+def verify_inclusion(leaf, proof, root):
+    """Check that `leaf` is in the accumulator whose root is `root`, using only the proof."""
+    node = leaf
+    for side, sibling in proof['siblings']:
+        sibling = bytes.fromhex(sibling)
+        node = node_hash(sibling, node) if side == 'L' else node_hash(node, sibling)
+    peaks = [bytes.fromhex(peak) for peak in proof['peaks']]
+    if not 0 <= proof['peak_index'] < len(peaks) or peaks[proof['peak_index']] != node:
+        return False
+    return bag_peaks(peaks) == root
+
+
+def verify_transaction(row, proof, root):
+    """verify_inclusion for a journal row dict (as returned by TransactionStore.row) and a hex root."""
+    leaf = leaf_hash(row['seq'], row['account'], row['amount'], row['balance'], row['frozen_balance'],
+                     bytes.fromhex(row['tx_hash']))
+    return verify_inclusion(leaf, proof, bytes.fromhex(root))
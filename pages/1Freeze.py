@@ -1,169 +1,143 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime
-import hashlib
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.asymmetric import padding, rsa
-
-class EnhancedZKProof:
-    @staticmethod
-    def generate_keys():
-        private_key = rsa.generate_private_key(
-            public_exponent=65537,
-            key_size=2048
-        )
-        public_key = private_key.public_key()
-        return private_key, public_key
-
-    @staticmethod
-    def generate_proof(private_key, public):
-        signature = private_key.sign(
-            public.encode(),
-            padding.PSS(
-                mgf=padding.MGF1(hashes.SHA256()),
-                salt_length=padding.PSS.MAX_LENGTH
-            ),
-            hashes.SHA256()
-        )
-        return signature
-
-    @staticmethod
-    def verify_proof(public_key, signature, public):
-        try:
-            public_key.verify(
-                signature,
-                public.encode(),
-                padding.PSS(
-                    mgf=padding.MGF1(hashes.SHA256()),
-                    salt_length=padding.PSS.MAX_LENGTH
-                ),
-                hashes.SHA256()
-            )
-            return True
-        except:
-            return False
-
-class EthereumAccount:
-    def __init__(self, name, balance=0):
-        self.name = name
-        self.balance = balance
-        self.frozen_balance = 0
-        self.nonce = 0
-        self.transactions = []
-        self.private_key, self.public_key = EnhancedZKProof.generate_keys()
-
-    def add_transaction(self, amount, description, to_address, is_frozen=False, purpose=None):
-        if is_frozen:
-            self.frozen_balance += amount
-        else:
-            self.balance += amount
-        self.nonce += 1
-        tx_hash = hashlib.sha256(f"{self.nonce}{amount}{to_address}".encode()).hexdigest()
-        self.transactions.append({
-            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            'amount': amount,
-            'description': description,
-            'balance': self.balance,
-            'frozen_balance': self.frozen_balance,
-            'tx_hash': tx_hash,
-            'purpose': purpose
-        })
-        return tx_hash
-
-class EthereumScholarshipSystem:
-    def __init__(self):
-        self.accounts = {
-            'Admin': EthereumAccount('Admin', 1000000),
-            'Student1': EthereumAccount('Student1'),
-            'Student2': EthereumAccount('Student2'),
-            'Vendor1': EthereumAccount('Vendor1'),
-            'Vendor2': EthereumAccount('Vendor2')
-        }
-        self.zkp = EnhancedZKProof()
-        self.approved_vendors = {'Vendor1', 'Vendor2'}
-        self.educational_purposes = {'Tuition', 'Books', 'School Supplies', 'Accommodation'}
-        self.disallowed_purposes = {'Buy Alcohol', 'Buy Cigarette', 'Buy to Watch Non-Educational'}
-        self.spending_limits = {'Tuition': 10000, 'Books': 1000, 'School Supplies': 500, 'Accommodation': 5000}
-
-    def issue_scholarship(self, student, amount):
-        if self.accounts['Admin'].balance >= amount:
-            tx_hash = self.accounts['Admin'].add_transaction(-amount, f"Issue scholarship to {student}", student)
-            self.accounts[student].add_transaction(amount, "Receive scholarship", 'Admin', is_frozen=True)
-            return tx_hash
-        return None
-
-    def spend_scholarship(self, student, vendor, amount, purpose):
-        if vendor not in self.approved_vendors:
-            return None, None, "Vendor not approved for educational expenses"
-        
-        if purpose in self.disallowed_purposes:
-            return None, None, f"Spending on '{purpose}' is not allowed."
-
-        if purpose not in self.educational_purposes:
-            return None, None, "Purpose is not educational"
-
-        if amount > self.spending_limits.get(purpose, 0):
-            return None, None, f"Amount exceeds spending limit for {purpose}"
-
-        public = f"{student}{vendor}{amount}{purpose}"
-        proof = self.zkp.generate_proof(self.accounts[student].private_key, public)
-
-        if self.zkp.verify_proof(self.accounts[student].public_key, proof, public) and self.accounts[student].frozen_balance >= amount:
-            tx_hash_student = self.accounts[student].add_transaction(-amount, f"Spend at {vendor}", vendor, is_frozen=True, purpose=purpose)
-            tx_hash_vendor = self.accounts[vendor].add_transaction(amount, f"Receive from {student}", student, purpose=purpose)
-            return tx_hash_student, proof, "Transaction successful"
-        return None, None, "Insufficient frozen funds or invalid proof"
-
-    def get_all_transactions(self):
-        all_transactions = []
-        for account in self.accounts.values():
-            all_transactions.extend(account.transactions)
-        return sorted(all_transactions, key=lambda x: x['timestamp'], reverse=True)
-
-    def transfer_scholarship(self, from_student, to_student, amount):
-        if self.accounts[from_student].frozen_balance >= amount:
-            tx_hash_from = self.accounts[from_student].add_transaction(-amount, f"Transfer to {to_student}", to_student, is_frozen=True)
-            tx_hash_to = self.accounts[to_student].add_transaction(amount, f"Receive from {from_student}", from_student, is_frozen=True)
-            return tx_hash_from
+from datetime import datetime, time
+
+from instrumentation import show_metrics_panel, timer
+from issuance import read_issuances
+from merkle import verify_transaction
+from persistence import open_ledger
+
+PAGE_SIZE = 50
+TRANSACTION_COLUMNS = ['seq', 'timestamp', 'account', 'amount', 'description', 'balance', 'frozen_balance', 'tx_hash', 'purpose']
+DEFAULT_COLUMNS = ['seq', 'timestamp', 'account', 'amount', 'description', 'frozen_balance', 'purpose']
+
+@st.cache_resource
+def load_system():
+    # One ledger per process, shared by every session; EthereumScholarshipSystem does its own locking.
+    return open_ledger()
+
+def transaction_pager(system, key, account=None, start=None, end=None):
+    """Show one fixed-size page of the journal, newest first, with keyset Previous/Next paging."""
+    cursors_key = f"{key}_cursors"
+    filters = (account, start, end)
+    # The cursor stack holds the exclusive upper seq of every page visited so far; None is the newest page.
+    if st.session_state.get(f"{key}_filters") != filters:
+        st.session_state[f"{key}_filters"] = filters
+        st.session_state[cursors_key] = [None]
+    cursors = st.session_state[cursors_key]
+
+    columns = st.multiselect("Columns", TRANSACTION_COLUMNS, default=DEFAULT_COLUMNS, key=f"{key}_columns")
+    transactions, next_cursor = system.journal.page(
+        limit=PAGE_SIZE, before=cursors[-1], account=account, start=start, end=end,
+        columns=[c for c in TRANSACTION_COLUMNS if c in columns] or None
+    )
+    with timer('render.transactions'):
+        st.dataframe(transactions, height=400, hide_index=True)
+
+    prev_col, page_col, next_col = st.columns([1, 2, 1])
+    page_col.caption(f"Page {len(cursors)} · {len(system.journal)} transactions in ledger")
+    if prev_col.button("Previous", key=f"{key}_prev", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+    if next_col.button("Next", key=f"{key}_next", disabled=next_cursor is None):
+        cursors.append(next_cursor)
+        st.rerun()
+
+def account_picker(label, names, key):
+    """Select one of `names` by searching; the dropdown lists at most PAGE_SIZE matches. None if nothing matches."""
+    query = st.text_input(f"Search: {label}", key=f"{key}_search").strip().lower()
+    matches = [name for name in names if query in name.lower()] if query else list(names)
+    if not matches:
+        st.warning("No account matches that search.")
         return None
+    if len(matches) > PAGE_SIZE:
+        st.caption(f"Showing the first {PAGE_SIZE} of {len(matches)} accounts; type more of the name to narrow the list.")
+    return st.selectbox(label, matches[:PAGE_SIZE], key=key)
+
+def balance_pager(system, when=None):
+    """Show one page of account balances (current, or as of `when` epoch seconds), filtered by a name search."""
+    query = st.text_input("Search accounts").strip().lower()
+    names = [name for name in system.accounts if query in name.lower()] if query else list(system.accounts)
+    # Back to the first page whenever the search or the point in time changes.
+    if st.session_state.get("balances_filters") != (query, when):
+        st.session_state["balances_filters"] = (query, when)
+        st.session_state["balances_page"] = 0
+    page = st.session_state["balances_page"]
+    shown = names[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
+
+    if when is None:
+        rows = [(name, system.accounts[name].balance, system.accounts[name].frozen_balance) for name in shown]
+    else:
+        found = system.balances_as_of(when)
+        rows = [(name, *found[name]) for name in shown]
+    with timer('render.balances'):
+        st.table(pd.DataFrame(rows, columns=["Account", "Regular", "Frozen"]))
+
+    pages = max(-(-len(names) // PAGE_SIZE), 1)
+    prev_col, page_col, next_col = st.columns([1, 2, 1])
+    page_col.caption(f"Page {page + 1} of {pages} · {len(names)} accounts")
+    if prev_col.button("Previous", key="balances_prev", disabled=page == 0):
+        st.session_state["balances_page"] -= 1
+        st.rerun()
+    if next_col.button("Next", key="balances_next", disabled=page + 1 >= pages):
+        st.session_state["balances_page"] += 1
+        st.rerun()
 
 def main():
     st.title("Ethcash")
 
-    if 'system' not in st.session_state:
-        st.session_state.system = EthereumScholarshipSystem()
-
-    system = st.session_state.system
+    system = load_system()
 
     st.sidebar.header("Actions")
-    action = st.sidebar.selectbox("Choose an action", ["View Balances", "Issue Scholarship", "Spend Scholarship", "Transfer Scholarship", "Admin View"])
+    action = st.sidebar.selectbox("Choose an action", ["View Balances", "Issue Scholarship", "Spend Scholarship", "Transfer Scholarship", "Look Up Transaction", "Admin View"])
 
     if action == "View Balances":
         st.header("Account Balances")
-        balances = {name: f"Regular: {account.balance}, Frozen: {account.frozen_balance}" 
-                    for name, account in system.accounts.items()}
-        st.table(pd.DataFrame(list(balances.items()), columns=["Account", "Balance"]))
+        when = None
+        if st.checkbox("Show balances as of a past time"):
+            as_of_date = st.date_input("As of date")
+            as_of_time = st.time_input("As of time", value=time(23, 59))
+            when = datetime.combine(as_of_date, as_of_time).timestamp()
+        balance_pager(system, when)
 
     elif action == "Issue Scholarship":
         st.header("Issue Scholarship")
-        student = st.selectbox("Select Student", ["Student1", "Student2"])
+        student = account_picker("Select Student", system.student_names(), "issue_student")
         amount = st.number_input("Amount", min_value=1, max_value=system.accounts['Admin'].balance)
-        if st.button("Issue Scholarship"):
+        if st.button("Issue Scholarship", disabled=student is None):
             tx_hash = system.issue_scholarship(student, amount)
             if tx_hash:
                 st.success(f"Successfully issued {amount} to {student} as frozen funds. Transaction Hash: {tx_hash}")
             else:
                 st.error("Failed to issue scholarship. Insufficient admin funds.")
 
+        st.subheader("Bulk Issue")
+        upload = st.file_uploader("Upload a CSV or Parquet file with 'student' and 'amount' columns", type=["csv", "parquet"])
+        if upload is not None and st.button("Issue to Cohort"):
+            try:
+                issuances = read_issuances(upload)
+            except (ValueError, ImportError) as e:
+                # ImportError: Parquet support (pyarrow) isn't installed.
+                st.error(f"Could not read {upload.name}. {e}")
+            else:
+                tx_hashes, rejections, message = system.issue_scholarships(issuances)
+                if tx_hashes:
+                    st.success(message)
+                else:
+                    st.error(message)
+                if len(rejections):
+                    st.dataframe(rejections)
+
     elif action == "Spend Scholarship":
         st.header("Spend Scholarship")
-        student = st.selectbox("Select Student", ["Student1", "Student2"])
+        student = account_picker("Select Student", system.student_names(), "spend_student")
         vendor = st.selectbox("Select Vendor", ["Vendor1", "Vendor2"])
-        purpose = st.selectbox("Select Purpose", list(system.educational_purposes) + list(system.disallowed_purposes))
-        max_amount = min(system.accounts[student].frozen_balance, system.spending_limits.get(purpose, system.accounts[student].frozen_balance))
+        purpose = st.selectbox("Select Purpose", system.educational_purposes + system.disallowed_purposes)
+        frozen_balance = system.accounts[student].frozen_balance if student is not None else 0
+        max_amount = min(frozen_balance, system.spending_limits.get(purpose, frozen_balance))
         amount = st.number_input("Amount", min_value=1, max_value=max_amount) if max_amount > 0 else 0
 
-        if st.button("Spend Scholarship"):
+        if st.button("Spend Scholarship", disabled=student is None):
             tx_hash, proof, message = system.spend_scholarship(student, vendor, amount, purpose)
             if tx_hash:
                 st.success(f"Successfully spent {amount} from {student} to {vendor} for {purpose}. Transaction Hash: {tx_hash}")
@@ -173,26 +147,65 @@ def main():
 
     elif action == "Transfer Scholarship":
         st.header("Transfer Scholarship")
-        from_student = st.selectbox("From Student", ["Student1", "Student2"])
-        to_student = st.selectbox("To Student", [s for s in ["Student1", "Student2"] if s != from_student])
-        max_amount = system.accounts[from_student].frozen_balance
+        students = system.student_names()
+        from_student = account_picker("From Student", students, "transfer_from")
+        to_student = account_picker("To Student", [s for s in students if s != from_student], "transfer_to")
+        max_amount = system.accounts[from_student].frozen_balance if from_student is not None else 0
         amount = st.number_input("Amount", min_value=1, max_value=max_amount) if max_amount > 0 else 0
 
-        if st.button("Transfer Scholarship"):
+        if st.button("Transfer Scholarship", disabled=from_student is None or to_student is None):
             tx_hash = system.transfer_scholarship(from_student, to_student, amount)
             if tx_hash:
                 st.success(f"Successfully transferred {amount} from {from_student} to {to_student}. Transaction Hash: {tx_hash}")
             else:
                 st.error("Failed to transfer scholarship. Insufficient funds.")
 
+    elif action == "Look Up Transaction":
+        st.header("Look Up Transaction")
+        tx_hash = st.text_input("Transaction hash").strip()
+        if tx_hash:
+            row = system.find_transaction(tx_hash)
+            if row is None:
+                st.error("No transaction with that hash.")
+            else:
+                st.success(f"Transaction {row['seq']} by {row['account']} at {row['timestamp']}.")
+                st.json(row)
+
     elif action == "Admin View":
         st.header("Admin View - All Transactions")
-        all_transactions = system.get_all_transactions()
-        st.table(pd.DataFrame(all_transactions))
+        account_filter = account_picker("Filter by Account", ["All", *system.accounts], "admin_account")
+        date_range = st.date_input("Date Range", value=())
+        start = end = None
+        if len(date_range) == 2:
+            start = datetime.combine(date_range[0], time.min).timestamp()
+            end = datetime.combine(date_range[1], time.max).timestamp()
+
+        transaction_pager(system, "admin", None if account_filter in (None, "All") else account_filter, start, end)
+
+        st.subheader("Audit")
+        root = system.merkle_root()
+        st.write("Ledger Merkle root:")
+        st.code(root)
+        tx_hash = st.text_input("Transaction hash to prove").strip()
+        if tx_hash:
+            found = system.prove_transaction(tx_hash)
+            if found is None:
+                st.error("No transaction with that hash.")
+            else:
+                # The proof comes with the root it was built against; other sessions may have appended since.
+                row, proof, proof_root = found
+                if verify_transaction(row, proof, proof_root):
+                    st.success(f"Transaction {row['seq']} is included under the root of the first {proof['size']} transactions.")
+                else:
+                    st.error("Inclusion proof did not verify.")
+                st.json({'transaction': row, 'proof': proof, 'root': proof_root})
 
     st.header("Transaction History")
-    account = st.selectbox("Select Account", list(system.accounts.keys()))
-    st.table(pd.DataFrame(system.accounts[account].transactions))
+    account = account_picker("Select Account", system.accounts, "history_account")
+    if account is not None:
+        transaction_pager(system, "history", account)
 
 if __name__ == "__main__":
-    main()
+    with timer('rerun.freeze'):
+        main()
+    show_metrics_panel()
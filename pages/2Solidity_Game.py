@@ -1,11 +1,21 @@
 import streamlit as st
 
+from chapter_packs import load_chapters
+from instrumentation import show_metrics_panel, timer
+from leaderboard import open_leaderboard
+from utils import code_checker
+
+# Stopped at the bottom of the script; runs cut short by st.rerun() aren't recorded.
+rerun_timer = timer('rerun.solidity_quest').start()
+
 # Initialize the game state
 if 'current_chapter' not in st.session_state:
     st.session_state['current_chapter'] = 1
     st.session_state['points'] = 0
     st.session_state['character'] = None
-    st.session_state['leaderboard'] = []
+
+# Shared by every player of this game and kept across restarts
+leaderboard = open_leaderboard('solidity_quest')
 
 # Character creation
 if not st.session_state['character']:
@@ -31,99 +41,13 @@ if st.session_state['character']:
     st.sidebar.write(f"Points: {st.session_state['points']}")
 
     st.sidebar.title("🏆 Leaderboard")
-    for entry in sorted(st.session_state['leaderboard'], key=lambda x: x['points'], reverse=True):
-        st.sidebar.write(f"{entry['name']}: {entry['points']} points")
-
-# Define chapters with story, tasks, and interactive quizzes
-chapters = {
-    1: {
-        "title": "🌟 Chapter 1: The Call to Solidity",
-        "story": """
-        In the kingdom of Ethereon, magic flows through smart contracts. To wield the power of Solidity, you must first learn its essence. 
-        The ancient scrolls speak of a simple task to start your journey: Declare a magical number that others can see.
-        """,
-        "task": "Your task is to create a public variable in Solidity that stores a number.",
-        "code": """
-        // SPDX-License-Identifier: MIT
-        pragma solidity ^0.8.0;
-
-        contract MyFirstContract {
-            uint public myNumber = 42;
-        }
-        """,
-        "quiz": {
-            "question": "What keyword makes a variable visible to everyone on the blockchain?",
-            "options": ["hidden", "private", "public", "external"],
-            "answer": "public"
-        }
-    },
-    2: {
-        "title": "🔮 Chapter 2: Mastering Variables",
-        "story": """
-        The power of Solidity is in its ability to change the world—starting with numbers. 
-        Now that you can declare a variable, can you command it to change?
-        """,
-        "task": "Create a function to update the variable's value.",
-        "code": """
-        contract UpdateNumber {
-            uint public number;
-
-            function setNumber(uint _number) public {
-                number = _number;
-            }
-        }
-        """,
-        "quiz": {
-            "question": "Which keyword allows you to create a function that modifies the state of a contract?",
-            "options": ["constant", "mutable", "view", "public"],
-            "answer": "public"
-        }
-    },
-    3: {
-        "title": "⚔️ Chapter 3: The Logic of the Contract",
-        "story": """
-        Now that you can declare and change numbers, your next challenge is to make Solidity perform calculations. 
-        The spell of addition must be learned before you can progress.
-        """,
-        "task": "Write a function that adds two numbers and returns the result.",
-        "code": """
-        contract AddNumbers {
-            function add(uint a, uint b) public pure returns (uint) {
-                return a + b;
-            }
-        }
-        """,
-        "quiz": {
-            "question": "Which keyword is used to indicate a function won't modify the blockchain state?",
-            "options": ["pure", "static", "view", "immutable"],
-            "answer": "pure"
-        }
-    },
-    4: {
-        "title": "💡 Chapter 4: Conditional Magic",
-        "story": """
-        In this chapter, you must master the art of decision-making. Solidity can choose different paths based on conditions. 
-        Wield the power of `if` to create logic in your contracts.
-        """,
-        "task": "Write a function that checks if a number is even or odd and returns the result.",
-        "code": """
-        contract EvenOdd {
-            function isEven(uint num) public pure returns (string memory) {
-                if (num % 2 == 0) {
-                    return "Even";
-                } else {
-                    return "Odd";
-                }
-            }
-        }
-        """,
-        "quiz": {
-            "question": "What operator is used to check if a number is divisible by another number?",
-            "options": ["%", "*", "/", "+"],
-            "answer": "%"
-        }
-    }
-}
+    for name, points in leaderboard.top(10):
+        st.sidebar.write(f"{name}: {points} points")
+    if standing := leaderboard.rank(st.session_state['character']['name']):
+        st.sidebar.write(f"Your best: #{standing[0]} of {len(leaderboard)} with {standing[1]} points")
+
+# Chapters come from the shared, load-once pack in chapters/solidity_basics.json
+chapters = load_chapters()
 
 # Story progression logic
 if st.session_state['character']:
@@ -137,6 +61,9 @@ if st.session_state['character']:
         st.write(chapter['task'])
         st.code(chapter['code'], language="solidity")
 
+        # Let the player write the code and grade it offline
+        code_checker(chapter, key=f"solution_{st.session_state['current_chapter']}")
+
         # Chapter quiz
         st.subheader("📚 Quiz Time")
         quiz = chapter['quiz']
@@ -156,10 +83,7 @@ if st.session_state['character']:
         # End of the story
         st.balloons()
         st.title("🎉 Victory! You've mastered the basics of Solidity!")
-        st.session_state['leaderboard'].append({
-            "name": st.session_state['character']['name'],
-            "points": st.session_state['points']
-        })
+        leaderboard.submit(st.session_state['character']['name'], st.session_state['points'])
         st.session_state['current_chapter'] = 1
         st.session_state['points'] = 0
         st.session_state['character'] = None
@@ -171,3 +95,6 @@ if st.sidebar.button("🔄 Restart Adventure"):
     st.session_state['points'] = 0
     st.session_state['character'] = None
     st.rerun()
+
+rerun_timer.stop()
+show_metrics_panel()
@@ -1,39 +1,122 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
-import cohere
 
-# Initialize Cohere client
-co = cohere.Client('GHyObF1CtNtzlgdHzrpdnXVq8lZRjporWOnGWo3Y')
+from chapter_packs import load_chapters
+from instrumentation import count, show_metrics_panel, timer
+from leaderboard import open_leaderboard
+from llm import get_gateway
+from utils import code_checker
 
-# Function to generate personalized story elements
-def generate_dynamic_story(chapter_title, role, progress):
+# Stopped at the bottom of the script; runs cut short by st.rerun() aren't recorded.
+rerun_timer = timer('rerun.solidity_quest_ai').start()
+
+# Shared Cohere gateway: pooled client, deadlines and retries
+co = get_gateway()
+
+# How long an answer or a chapter waits for its prefetched text before showing a static fallback
+PREFETCH_DEADLINE = float(os.environ.get('ETHCASH_PREFETCH_DEADLINE', '10'))
+
+# Optional offline-generated stories: a JSON list of {"chapter_title", "role", "chapter", "story"} objects
+STORY_PACK = os.environ.get('ETHCASH_STORY_PACK', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'story_pack.json'))
+
+@st.cache_resource
+def load_story_pack():
+    if not os.path.exists(STORY_PACK):
+        return {}
+    with open(STORY_PACK) as f:
+        return {(entry['chapter_title'], entry['role'], entry['chapter']): entry['story'] for entry in json.load(f)}
+
+def story_text(chapter_title, role, progress):
     prompt = f"In a fantasy world, {role} embarks on Chapter {progress} titled '{chapter_title}'. Describe the challenges they face."
-    response = co.generate(
-        model='command-xlarge-nightly',
-        prompt=prompt,
-        max_tokens=150
-    )
+    with timer('cohere.generate.story'):
+        response = co.generate(
+            model='command-xlarge-nightly',
+            prompt=prompt,
+            max_tokens=150
+        )
     return response.generations[0].text
 
-# Function to generate dynamic feedback for quiz answers
+# Function to generate personalized story elements (shared across sessions, bounded)
+@st.cache_data(max_entries=512, show_spinner=False)
+def generate_dynamic_story(chapter_title, role, progress):
+    return story_text(chapter_title, role, progress)
+
+def fallback_story(chapter_title, role):
+    return f"{role} steps into {chapter_title}, ready for whatever challenge lies ahead."
+
+# Function to generate dynamic feedback for quiz answers; the prompt only depends on (correct, role), so it's shared across sessions
+@st.cache_data(max_entries=64, show_spinner=False)
 def generate_feedback(correct, role):
     if correct:
         prompt = f"As a {role}, after a victorious success in a challenge, describe how they feel and what their next goal is."
     else:
         prompt = f"As a {role}, after failing in a challenge, describe their determination to try again and how they plan to improve."
     
-    response = co.generate(
-        model='command-xlarge-nightly',
-        prompt=prompt,
-        max_tokens=100
-    )
+    with timer('cohere.generate.feedback'):
+        response = co.generate(
+            model='command-xlarge-nightly',
+            prompt=prompt,
+            max_tokens=100
+        )
     return response.generations[0].text
 
+def fallback_feedback(correct):
+    return "Onward to the next challenge!" if correct else "Study the code once more and try again."
+
+@st.cache_resource
+def prefetch_pool():
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix='prefetch')
+
+def prefetch(key, fn, *args):
+    """Start fn(*args) in the background, once per session and key; collect it with prefetched(key)."""
+    jobs = st.session_state.setdefault('prefetch', {})
+    if key not in jobs:
+        jobs[key] = (time.monotonic(), prefetch_pool().submit(fn, *args))
+
+def prefetched(key):
+    """The prefetched result, waiting at most until the job's deadline; None if it failed or is late."""
+    started, future = st.session_state['prefetch'][key]
+    try:
+        return future.result(timeout=max(started + PREFETCH_DEADLINE - time.monotonic(), 0))
+    except Exception:
+        if future.done():
+            # Failed rather than late: forget it so the next attempt goes to the model directly.
+            del st.session_state['prefetch'][key]
+        count('prefetch.missed')
+        return None
+
+def chapter_story(chapter_title, role, progress):
+    """The player's story for a chapter: fixed for the session, generated at most once per (title, role, chapter)."""
+    key = (chapter_title, role, progress)
+    stories = st.session_state.setdefault('stories', {})
+    if key not in stories:
+        story = load_story_pack().get(key)
+        if story is None and ('story',) + key in st.session_state.get('prefetch', {}):
+            story = prefetched(('story',) + key)
+            if story is None:
+                return fallback_story(chapter_title, role)
+        if story is None:
+            try:
+                story = generate_dynamic_story(*key)
+            except Exception:
+                # Not stored, so the next rerun tries the model again.
+                count('cohere.generate.fallback')
+                return fallback_story(chapter_title, role)
+        stories[key] = story
+    return stories[key]
+
 # Initialize the game state
 if 'current_chapter' not in st.session_state:
     st.session_state['current_chapter'] = 1
     st.session_state['points'] = 0
     st.session_state['character'] = None
-    st.session_state['leaderboard'] = []
+
+# Shared by every player of this game and kept across restarts
+leaderboard = open_leaderboard('solidity_quest_ai')
 
 # Character creation
 if not st.session_state['character']:
@@ -59,102 +142,49 @@ if st.session_state['character']:
     st.sidebar.write(f"Points: {st.session_state['points']}")
 
     st.sidebar.title("🏆 Leaderboard")
-    if st.session_state['leaderboard']:
-        for entry in sorted(st.session_state['leaderboard'], key=lambda x: x['points'], reverse=True):
-            st.sidebar.write(f"{entry['name']}: {entry['points']} points")
+    if len(leaderboard):
+        for name, points in leaderboard.top(10):
+            st.sidebar.write(f"{name}: {points} points")
+        if standing := leaderboard.rank(st.session_state['character']['name']):
+            st.sidebar.write(f"Your best: #{standing[0]} of {len(leaderboard)} with {standing[1]} points")
     else:
         st.sidebar.write("No heroes have completed the quest yet.")
 
-# Define chapters with story, tasks, and interactive quizzes
-chapters = {
-    1: {
-        "title": "🌟 Chapter 1: The Call to Solidity",
-        "task": "Your task is to create a public variable in Solidity that stores a number.",
-        "code": """
-        // SPDX-License-Identifier: MIT
-        pragma solidity ^0.8.0;
-
-        contract MyFirstContract {
-            uint public myNumber = 42;
-        }
-        """,
-        "quiz": {
-            "question": "What keyword makes a variable visible to everyone on the blockchain?",
-            "options": ["hidden", "private", "public", "external"],
-            "answer": "public"
-        }
-    },
-    2: {
-        "title": "🔮 Chapter 2: Mastering Variables",
-        "task": "Create a function to update the variable's value.",
-        "code": """
-        contract UpdateNumber {
-            uint public number;
-
-            function setNumber(uint _number) public {
-                number = _number;
-            }
-        }
-        """,
-        "quiz": {
-            "question": "Which keyword allows you to create a function that modifies the state of a contract?",
-            "options": ["constant", "mutable", "view", "public"],
-            "answer": "public"
-        }
-    },
-    3: {
-        "title": "⚔️ Chapter 3: The Logic of the Contract",
-        "task": "Write a function that adds two numbers and returns the result.",
-        "code": """
-        contract AddNumbers {
-            function add(uint a, uint b) public pure returns (uint) {
-                return a + b;
-            }
-        }
-        """,
-        "quiz": {
-            "question": "Which keyword is used to indicate a function won't modify the blockchain state?",
-            "options": ["pure", "static", "view", "immutable"],
-            "answer": "pure"
-        }
-    },
-    4: {
-        "title": "💡 Chapter 4: Conditional Magic",
-        "task": "Write a function that checks if a number is even or odd and returns the result.",
-        "code": """
-        contract EvenOdd {
-            function isEven(uint num) public pure returns (string memory) {
-                if (num % 2 == 0) {
-                    return "Even";
-                } else {
-                    return "Odd";
-                }
-            }
-        }
-        """,
-        "quiz": {
-            "question": "What operator is used to check if a number is divisible by another number?",
-            "options": ["%", "*", "/", "+"],
-            "answer": "%"
-        }
-    }
-}
+# Chapters come from the shared, load-once pack in chapters/solidity_basics.json
+chapters = load_chapters()
 
 # Story progression logic
 if st.session_state['character']:
     if st.session_state['current_chapter'] <= len(chapters):
         chapter = chapters[st.session_state['current_chapter']]
-        
+        role = st.session_state['character']['role']
+        progress = st.session_state['current_chapter']
+
+        if 'flash' in st.session_state:
+            st.success(st.session_state.pop('flash'))
+
         # Generate dynamic story based on chapter and character
-        dynamic_story = generate_dynamic_story(chapter['title'], st.session_state['character']['role'], st.session_state['current_chapter'])
+        dynamic_story = chapter_story(chapter['title'], role, progress)
         st.title(chapter['title'])
         st.write(dynamic_story)  # Display the dynamically generated story
 
+        # While the player reads, generate both possible feedbacks and the next chapter's story.
+        # Both go through the cross-session caches, so only the first player of a role pays for them.
+        prefetch(('feedback', role, True), generate_feedback, True, role)
+        prefetch(('feedback', role, False), generate_feedback, False, role)
+        if progress + 1 in chapters:
+            next_title = chapters[progress + 1]['title']
+            if (next_title, role, progress + 1) not in st.session_state['stories'] and (next_title, role, progress + 1) not in load_story_pack():
+                prefetch(('story', next_title, role, progress + 1), generate_dynamic_story, next_title, role, progress + 1)
+
         # Show task and code for the chapter
         st.subheader("⚙️ Your Task")
         st.write(chapter['task'])
         st.code(chapter['code'], language="solidity")
 
+        # Let the player write the code and grade it offline
+        code_checker(chapter, key=f"solution_{st.session_state['current_chapter']}")
+
         # Chapter quiz
         st.subheader("📚 Quiz Time")
         quiz = chapter['quiz']
@@ -163,13 +193,14 @@ if st.session_state['character']:
         # Validate quiz answer
         if st.button("Submit Answer"):
             if answer == quiz['answer']:
-                feedback = generate_feedback(True, st.session_state['character']['role'])  # Dynamic success feedback
-                st.success(f"🎉 Correct! You've earned 20 points! {feedback}")
+                feedback = prefetched(('feedback', role, True)) or fallback_feedback(True)  # Dynamic success feedback
+                # Shown at the top of the next chapter, since st.rerun() discards this run's output
+                st.session_state['flash'] = f"🎉 Correct! You've earned 20 points! {feedback}"
                 st.session_state['points'] += 20
                 st.session_state['current_chapter'] += 1
                 st.rerun()  # Move to the next chapter
             else:
-                feedback = generate_feedback(False, st.session_state['character']['role'])  # Dynamic failure feedback
+                feedback = prefetched(('feedback', role, False)) or fallback_feedback(False)  # Dynamic failure feedback
                 st.error(f"❌ Oops! Try again. {feedback}")
 
     else:
@@ -178,17 +209,14 @@ if st.session_state['character']:
         st.title("🎉 Victory! You've mastered the basics of Solidity!")
         
         # Add the current character's score to the leaderboard
-        st.session_state['leaderboard'].append({
-            "name": st.session_state['character']['name'],
-            "points": st.session_state['points']
-        })
+        leaderboard.submit(st.session_state['character']['name'], st.session_state['points'])
         
         # Display the leaderboard
         st.subheader("🏆 Final Leaderboard")
-        for entry in sorted(st.session_state['leaderboard'], key=lambda x: x['points'], reverse=True):
-            st.write(f"{entry['name']}: {entry['points']} points")
+        for name, points in leaderboard.top(10):
+            st.write(f"{name}: {points} points")
 
-        # Reset game state but keep the leaderboard
+        # Reset game state; the leaderboard lives in leaderboard.py
         st.session_state['current_chapter'] = 1
         st.session_state['points'] = 0
         st.session_state['character'] = None
@@ -200,3 +228,6 @@ if st.sidebar.button("🔄 Restart Adventure"):
     st.session_state['points'] = 0
     st.session_state['character'] = None
     st.rerun()
+
+rerun_timer.stop()
+show_metrics_panel()
@@ -1,7 +1,21 @@
-import cohere
+import os
+
 import streamlit as st
 
-co = cohere.Client('GHyObF1CtNtzlgdHzrpdnXVq8lZRjporWOnGWo3Y')  # Your trial API key
+from chat_history import ChatHistory
+from instrumentation import count, show_metrics_panel, timer
+from lazy_imports import lazy_import
+from llm import get_gateway
+from response_cache import ResponseCache
+
+co = get_gateway()
+
+# numpy and the index load on the first question, not when the page opens.
+knowledge_base = lazy_import('knowledge_base')
+
+MODEL = 'command-r-plus'
+# Replies are grounded in the local knowledge base; ETHCASH_WEB_SEARCH=1 uses Cohere's web-search connector instead.
+WEB_SEARCH = os.environ.get('ETHCASH_WEB_SEARCH') == '1'
 
 st.set_page_config(page_title="EthBot - Your Personal Ethereum Learning Assistant")
 st.title("EthBot")
@@ -43,22 +57,124 @@ docs = [
     },
 ]
 
-def cohereReply(prompt):
-    response = co.chat(
-        message=prompt,
-        model='command-r-plus',
-        preamble=preamble_prompt,
-        chat_history=st.session_state.messages,
-        connectors=[{"id": "web-search"}],
-    )
+@st.cache_resource
+def load_response_cache():
+    # Shared by every session, so common questions are answered once per TTL.
+    return ResponseCache()
+
+@st.cache_resource(max_entries=1)
+def open_knowledge_base(version):
+    return knowledge_base.open_knowledge_base()
+
+def load_knowledge_base():
+    # Keyed by the source fingerprint (one stat pass), so an edited document is re-indexed without a restart.
+    return open_knowledge_base(knowledge_base.fingerprint(knowledge_base.KNOWLEDGE_DIR))
+
+def grounding(prompt):
+    """Retrieval arguments for co.chat: the top local passages, or the web-search connector."""
+    if WEB_SEARCH:
+        return {"connectors": [{"id": "web-search"}]}
+    with timer('knowledge_base.search'):
+        documents = load_knowledge_base().search(prompt)
+    return {"documents": documents or docs}
+
+def reply_key(cache, prompt, history):
+    # The index version is part of the key so edited documents don't serve stale answers.
+    source = "web-search" if WEB_SEARCH else load_knowledge_base().version
+    return cache.key(prompt, history, f"{MODEL}/{source}", preamble_prompt)
+
+def summarize_history(summary, messages, max_tokens):
+    transcript = "\n".join(f"{m['role']}: {m['message']}" for m in messages)
+    with timer('cohere.summarize'):
+        response = co.chat(
+            message=f"Update the summary of this conversation about Ethereum with the new messages, "
+                    f"in under {max_tokens * 3 // 4} words. Keep the user's goals and any facts they shared.\n\n"
+                    f"Summary so far:\n{summary or '(none)'}\n\nNew messages:\n{transcript}",
+            model=MODEL,
+        )
     return response.text
 
+def cohereReply(prompt, history):
+    cache = load_response_cache()
+    key = reply_key(cache, prompt, history)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+    with timer('cohere.chat'):
+        response = co.chat(
+            message=prompt,
+            model=MODEL,
+            preamble=preamble_prompt,
+            chat_history=history,
+            **grounding(prompt),
+        )
+    cache.put(key, response.text)
+    return response.text
+
+class StreamedReply:
+    """Iterate to get the reply's text chunks as they arrive.
+
+    .text then holds everything received; .complete is False if the stream
+    failed (see .error) or was abandoned partway.
+    """
+
+    def __init__(self, prompt, history):
+        self.prompt = prompt
+        self.history = history
+        self.text = ""
+        self.error = None
+        self.complete = False
+
+    def __iter__(self):
+        chunks = []
+        first_token = timer('cohere.chat_stream.first_token')
+        total = timer('cohere.chat_stream')
+        try:
+            # Inside the try: the key builds or loads the knowledge index, which can fail like the model call.
+            cache = load_response_cache()
+            key = reply_key(cache, self.prompt, self.history)
+            cached = cache.get(key)
+            if cached is not None:
+                chunks.append(cached)
+                self.complete = True
+                yield cached
+                return
+
+            first_token.start()
+            total.start()
+            for event in co.chat_stream(
+                message=self.prompt,
+                model=MODEL,
+                preamble=preamble_prompt,
+                chat_history=self.history,
+                **grounding(self.prompt),
+            ):
+                if event.event_type == "text-generation":
+                    first_token.stop()
+                    chunks.append(event.text)
+                    yield event.text
+            total.stop()
+            self.complete = True
+            cache.put(key, "".join(chunks))
+        except Exception as e:
+            self.error = e
+            count('cohere.chat_stream.error')
+        finally:
+            # Also runs when Streamlit abandons the generator because the user reran mid-stream.
+            self.text = "".join(chunks)
+            if not self.complete and self.error is None:
+                count('cohere.chat_stream.cancelled')
+
 def initialize_state():
     if "messages" not in st.session_state:
         st.session_state.messages = []
+    if "history" not in st.session_state:
+        # What is sent to the model: recent turns plus a running summary. messages keeps the full transcript for display.
+        st.session_state.history = ChatHistory(summarize=summarize_history)
 
 def main():
     initialize_state()
+    stream = st.sidebar.toggle("Stream responses", value=True)
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
             st.markdown(message["message"])
@@ -66,11 +182,34 @@ def main():
     if prompt := st.chat_input("What do you want to learn about Ethereum?"):
         st.chat_message("User").markdown(prompt)
         st.session_state.messages.append({"role": "User", "message": prompt})
+        history = st.session_state.history.window()
 
-        response = cohereReply(prompt)
         with st.chat_message("Chatbot"):
-            st.markdown(response)
-        st.session_state.messages.append({"role": "Chatbot", "message": response})
+            if stream:
+                reply = StreamedReply(prompt, history)
+                st.write_stream(reply)
+                if reply.error is not None:
+                    st.error(f"The reply was cut off: {reply.error}")
+                response = reply.text
+                complete = reply.complete
+            else:
+                try:
+                    response = cohereReply(prompt, history)
+                except Exception as e:
+                    st.error(f"EthBot couldn't answer right now: {e}")
+                    response = ""
+                else:
+                    st.markdown(response)
+                complete = bool(response)
+        if response and complete:
+            st.session_state.messages.append({"role": "Chatbot", "message": response})
+            st.session_state.history.add("User", prompt)
+            st.session_state.history.add("Chatbot", response)
+        elif response:
+            # Shown as cut off, but kept out of what the model sees next as if it were a full answer.
+            st.session_state.messages.append({"role": "Chatbot", "message": response + " … *(cut off)*"})
 
 if __name__ == "__main__":
-    main()
+    with timer('rerun.ethbot'):
+        main()
+    show_metrics_panel()
@@ -0,0 +1,323 @@
+"""Durable storage for the scholarship ledger.
+
+Every journal append is framed as a checksummed record in an append-only
+log. The two legs of an operation that moves value (issue, spend,
+transfer) share one frame, so a crash keeps both or neither. A background writer fsyncs whatever has accumulated in one go (group
+commit), and commit() waits for that. Periodic snapshots hold the full
+columnar journal; recovery loads the latest snapshot and replays only the
+log tail after it, reading the log through mmap.
+
+A data directory must have a single writer: open it through open_ledger,
+which returns the same system for repeated calls in one process.
+"""
+import json
+import mmap
+import os
+import shutil
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+from columnar import StringDictionary, TransactionStore
+from ledger import EthereumScholarshipSystem
+
+DATA_DIR = os.environ.get('ETHCASH_DATA_DIR', 'ethcash_data')
+
+FRAME = struct.Struct('<II')
+RECORD = struct.Struct('<Qdqqq32sHHh')
+
+
+def encode_record(seq, timestamp, account, amount, description, balance, frozen_balance, digest, purpose):
+    account_bytes = account.encode()
+    description_bytes = description.encode()
+    purpose_bytes = b'' if purpose is None else purpose.encode()
+    header = RECORD.pack(seq, timestamp, amount, balance, frozen_balance, digest,
+                         len(account_bytes), len(description_bytes),
+                         -1 if purpose is None else len(purpose_bytes))
+    return header + account_bytes + description_bytes + purpose_bytes
+
+
+def decode_record(payload, offset=0):
+    """Decode the record at `offset`; returns (record, offset just past it)."""
+    seq, timestamp, amount, balance, frozen_balance, digest, account_len, description_len, purpose_len = \
+        RECORD.unpack_from(payload, offset)
+    offset += RECORD.size
+    account = payload[offset:offset + account_len].decode()
+    offset += account_len
+    description = payload[offset:offset + description_len].decode()
+    offset += description_len
+    purpose = None if purpose_len < 0 else payload[offset:offset + purpose_len].decode()
+    offset += max(purpose_len, 0)
+    return (seq, timestamp, account, amount, description, balance, frozen_balance, digest, purpose), offset
+
+
+def read_records(path, offset=0):
+    """Yield (end_offset, record) from offset until the end or the first torn/corrupt frame.
+
+    A frame holds one or more records; all of them carry the frame's end offset.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) <= offset:
+        return
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        while offset + FRAME.size <= len(data):
+            length, checksum = FRAME.unpack_from(data, offset)
+            start = offset + FRAME.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                return
+            offset = start + length
+            position = 0
+            while position < length:
+                record, position = decode_record(payload, position)
+                yield offset, record
+
+
+def fsync_directory(path):
+    """Make renames and new files in a directory durable."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class LedgerLog:
+    """Append-only record log with group commit."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'ab')
+        self._buffer = bytearray()
+        self._cond = threading.Condition()
+        self.appended = self.durable = self._file.tell()
+        # Set when a write or fsync fails; every later sync() raises it instead of waiting forever.
+        self.error = None
+        self._writer = threading.Thread(target=self._write_loop, name="ledger-log", daemon=True)
+        self._writer.start()
+
+    def append(self, payload):
+        frame = FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._cond:
+            self._buffer += frame
+            self.appended += len(frame)
+            self._cond.notify_all()
+            return self.appended
+
+    def sync(self, offset=None):
+        with self._cond:
+            offset = self.appended if offset is None else offset
+            while self.durable < offset:
+                if self.error is not None:
+                    raise OSError(f"Ledger log {self.path} is no longer writable") from self.error
+                self._cond.wait()
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                while not self._buffer:
+                    self._cond.wait()
+                data, self._buffer = bytes(self._buffer), bytearray()
+                end = self.appended
+            # Everything appended while this fsync runs goes out together in the next one.
+            try:
+                self._file.write(data)
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except Exception as e:
+                with self._cond:
+                    self.error = e
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                self.durable = end
+                self._cond.notify_all()
+
+
+class WriteAheadLog:
+    """Log plus snapshots for one EthereumScholarshipSystem data directory."""
+
+    def __init__(self, data_dir, snapshot_every=100_000):
+        self.data_dir = data_dir
+        self.snapshot_every = snapshot_every
+        self.snapshot_count = 0
+        self.log = None
+        # Records of the open atomic group; the journal lock is held while it's open.
+        self._group = None
+        self._snapshot_lock = threading.Lock()
+
+    @property
+    def log_path(self):
+        return os.path.join(self.data_dir, 'ledger.log')
+
+    def append(self, seq, timestamp, account, amount, description, balance, frozen_balance, digest, purpose):
+        record = encode_record(seq, timestamp, account, amount, description, balance, frozen_balance, digest, purpose)
+        if self._group is not None:
+            self._group.append(record)
+        else:
+            self.log.append(record)
+
+    def begin_group(self):
+        self._group = []
+
+    def end_group(self):
+        records, self._group = self._group, None
+        if records:
+            self.log.append(b''.join(records))
+
+    def commit(self, system):
+        self.log.sync()
+        if len(system.journal) - self.snapshot_count >= self.snapshot_every:
+            # Another session may already be writing this snapshot; it'll cover our records too.
+            if self._snapshot_lock.acquire(blocking=False):
+                try:
+                    self.snapshot(system)
+                finally:
+                    self._snapshot_lock.release()
+
+    def snapshot(self, system):
+        journal = system.journal
+        with journal.lock:
+            store = journal.store
+            count = len(store)
+            arrays = {array: getattr(store, array)[:count].copy() for array in TransactionStore._ARRAYS}
+            dictionaries = {field: list(getattr(store, field).values)
+                            for field in ('accounts', 'descriptions', 'purposes')}
+            # Balances come from each account's last journal row so they match `count` exactly,
+            # even while other sessions are mid-transaction.
+            accounts = {name: [int(store.balances[seqs[-1]]), int(store.frozen_balances[seqs[-1]]), len(seqs)]
+                        for name, seqs in journal.by_account.items()}
+            merkle_levels = [bytes(level) for level in journal.merkle.levels]
+            checkpoints = journal.checkpoints.to_arrays()
+            log_offset = self.log.appended
+        self.log.sync(log_offset)
+
+        name = f'snapshot-{count:012d}'
+        directory = os.path.join(self.data_dir, name)
+        os.makedirs(directory, exist_ok=True)
+        # Every file is fsynced before the pointer moves, so the pointer never names a partial snapshot.
+        for array, values in arrays.items():
+            with open(os.path.join(directory, f'{array}.npy'), 'wb') as f:
+                np.save(f, values)
+                f.flush()
+                os.fsync(f.fileno())
+        for height, level in enumerate(merkle_levels):
+            with open(os.path.join(directory, f'merkle-{height}.bin'), 'wb') as f:
+                f.write(level)
+                f.flush()
+                os.fsync(f.fileno())
+        for part, values in checkpoints.items():
+            with open(os.path.join(directory, f'checkpoints-{part}.npy'), 'wb') as f:
+                np.save(f, values)
+                f.flush()
+                os.fsync(f.fileno())
+        with open(os.path.join(directory, 'state.json'), 'w') as f:
+            json.dump({
+                'count': count,
+                'log_offset': log_offset,
+                'merkle_height': len(merkle_levels),
+                'accounts': accounts,
+                'dictionaries': dictionaries,
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        fsync_directory(directory)
+        # Point at the new snapshot atomically, then drop the old ones.
+        pointer = os.path.join(self.data_dir, 'SNAPSHOT')
+        with open(pointer + '.tmp', 'w') as f:
+            f.write(name)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(pointer + '.tmp', pointer)
+        fsync_directory(self.data_dir)
+        for entry in os.listdir(self.data_dir):
+            if entry.startswith('snapshot-') and entry != name:
+                shutil.rmtree(os.path.join(self.data_dir, entry), ignore_errors=True)
+        self.snapshot_count = count
+
+    def _load_snapshot(self, system):
+        pointer = os.path.join(self.data_dir, 'SNAPSHOT')
+        if not os.path.exists(pointer):
+            return 0
+        with open(pointer) as f:
+            directory = os.path.join(self.data_dir, f.read().strip())
+        with open(os.path.join(directory, 'state.json')) as f:
+            state = json.load(f)
+
+        count = state['count']
+        store = TransactionStore(capacity=max(1024, count * 2))
+        for array in TransactionStore._ARRAYS:
+            getattr(store, array)[:count] = np.load(os.path.join(directory, f'{array}.npy'), mmap_mode='r')
+        for field, values in state['dictionaries'].items():
+            dictionary = StringDictionary()
+            for value in values:
+                dictionary.encode(value)
+            setattr(store, field, dictionary)
+        store._size = count
+
+        journal = system.journal
+        journal.store = store
+        journal.by_account = {}
+        # One stable sort groups every account's seqs in order; each account is then a slice.
+        order = np.argsort(store.account_codes[:count], kind='stable')
+        bounds = np.searchsorted(store.account_codes[:count][order], np.arange(len(store.accounts.values) + 1))
+        for code, name in enumerate(store.accounts.values):
+            journal.by_account[name] = order[bounds[code]:bounds[code + 1]].tolist()
+        # Built on the first hash lookup, off the startup path.
+        journal.by_hash = None
+        if os.path.exists(os.path.join(directory, 'checkpoints-seqs.npy')):
+            journal.checkpoints.load_arrays({part: np.load(os.path.join(directory, f'checkpoints-{part}.npy'))
+                                             for part in ('seqs', 'widths', 'known', 'balances', 'frozen_balances')})
+        else:
+            # Snapshots written before checkpoints were saved.
+            journal.checkpoints.rebuild(store)
+        journal.merkle.levels = []
+        for height in range(state['merkle_height']):
+            with open(os.path.join(directory, f'merkle-{height}.bin'), 'rb') as f:
+                journal.merkle.levels.append(bytearray(f.read()))
+        for account, (balance, frozen_balance, nonce) in zip(system.add_accounts(state['accounts']),
+                                                              state['accounts'].values()):
+            account.balance, account.frozen_balance, account.nonce = balance, frozen_balance, nonce
+
+        self.snapshot_count = count
+        return state['log_offset']
+
+    def recover(self, system):
+        """Rebuild system state from disk, then start logging its new transactions."""
+        os.makedirs(self.data_dir, exist_ok=True)
+        offset = self._load_snapshot(system)
+        end = offset
+        tail = []
+        for end, record in read_records(self.log_path, offset):
+            if record[0] >= len(system.journal):
+                tail.append(record)
+        # Accounts first, in one batch: one add_account per record would copy the accounts dict each time.
+        system.add_accounts([record[2] for record in tail])
+        for seq, timestamp, name, amount, description, balance, frozen_balance, digest, purpose in tail:
+            account = system.accounts[name]
+            account.balance, account.frozen_balance = balance, frozen_balance
+            account.nonce += 1
+            system.journal.append(name, amount, description, balance, frozen_balance, digest, purpose,
+                                  timestamp=timestamp)
+        # Drop a torn tail left by a crash mid-write before appending after it.
+        if os.path.exists(self.log_path) and os.path.getsize(self.log_path) > end:
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(end)
+        system.rebuild_spending_totals()
+        self.log = LedgerLog(self.log_path)
+        system.journal.wal = system.wal = self
+
+
+_open_ledgers = {}
+_open_ledgers_lock = threading.Lock()
+
+
+def open_ledger(data_dir=None, engine=None, snapshot_every=100_000):
+    data_dir = os.path.abspath(data_dir or DATA_DIR)
+    with _open_ledgers_lock:
+        if data_dir not in _open_ledgers:
+            system = EthereumScholarshipSystem(engine)
+            WriteAheadLog(data_dir, snapshot_every).recover(system)
+            _open_ledgers[data_dir] = system
+        return _open_ledgers[data_dir]
@@ -0,0 +1,172 @@
+"""Declarative spending policy compiled into an integer-coded decision table.
+
+The rules file lists approved vendors, educational purposes with their
+per-transaction and per-period limits, and disallowed purposes. Loading
+it builds a (vendor code x purpose code) table of decisions plus limit
+arrays indexed by purpose code, so a check is a few array lookups however
+many rules there are. Cumulative spending is tracked per (student,
+purpose) over a rolling window of `period_days` ending now: every spend
+is kept until it ages out of the window, so each update is amortized O(1)
+and no boundary resets the total.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+POLICY_PATH = os.environ.get('ETHCASH_POLICY', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'spending_policy.json'))
+
+ALLOWED = 0
+VENDOR_NOT_APPROVED = 1
+PURPOSE_DISALLOWED = 2
+NOT_EDUCATIONAL = 3
+OVER_TRANSACTION_LIMIT = 4
+OVER_PERIOD_LIMIT = 5
+
+
+class SpendingPolicy:
+    def __init__(self, rules):
+        self.version = rules.get('version', 1)
+        self.period = rules.get('period_days', 120) * 86400
+        self.vendors = list(rules['vendors'])
+        self.educational_purposes = list(rules['purposes'])
+        self.disallowed_purposes = list(rules.get('disallowed', []))
+        self.spending_limits = {purpose: limits['per_transaction'] for purpose, limits in rules['purposes'].items()}
+
+        self.vendor_codes = {vendor: code for code, vendor in enumerate(self.vendors)}
+        self.purposes = self.educational_purposes + self.disallowed_purposes
+        self.purpose_codes = {purpose: code for code, purpose in enumerate(self.purposes)}
+        # The last code in each dimension stands for "anything not in the rules".
+        self.unknown_vendor = len(self.vendors)
+        self.unknown_purpose = len(self.purposes)
+
+        table = np.full((len(self.vendors) + 1, len(self.purposes) + 1), NOT_EDUCATIONAL, dtype=np.int8)
+        table[:, :len(self.educational_purposes)] = ALLOWED
+        table[:, len(self.educational_purposes):len(self.purposes)] = PURPOSE_DISALLOWED
+        table[self.unknown_vendor, :] = VENDOR_NOT_APPROVED
+        self.table = table
+
+        self.per_transaction = np.zeros(len(self.purposes) + 1, dtype=np.int64)
+        self.per_period = np.zeros(len(self.purposes) + 1, dtype=np.int64)
+        for purpose, limits in rules['purposes'].items():
+            code = self.purpose_codes[purpose]
+            self.per_transaction[code] = limits['per_transaction']
+            self.per_period[code] = limits.get('per_period', np.iinfo(np.int64).max)
+
+        # (student, purpose code) -> [deque of (timestamp, amount) inside the window, their total]
+        self._totals = {}
+        self._totals_lock = threading.Lock()
+        # Plain-list mirrors of the table for the scalar path; numpy scalar indexing is slower than a list.
+        self._table_rows = table.tolist()
+        self._per_transaction = self.per_transaction.tolist()
+        self._per_period = self.per_period.tolist()
+
+    def spent(self, student, purpose_code, now=None):
+        """Total spent on a purpose in the `period` seconds up to `now`."""
+        entry = self._totals.get((student, purpose_code))
+        if entry is None:
+            return 0
+        cutoff = (time.time() if now is None else now) - self.period
+        with self._totals_lock:
+            spends = entry[0]
+            while spends and spends[0][0] <= cutoff:
+                entry[1] -= spends.popleft()[1]
+            return entry[1]
+
+    def record(self, student, purpose, amount, now=None):
+        now = time.time() if now is None else now
+        key = (student, self.purpose_codes[purpose])
+        with self._totals_lock:
+            entry = self._totals.setdefault(key, [deque(), 0])
+            entry[0].append((now, amount))
+            entry[1] += amount
+
+    def message(self, decision, purpose):
+        if decision == VENDOR_NOT_APPROVED:
+            return "Vendor not approved for educational expenses"
+        if decision == PURPOSE_DISALLOWED:
+            return f"Spending on '{purpose}' is not allowed."
+        if decision == NOT_EDUCATIONAL:
+            return "Purpose is not educational"
+        if decision == OVER_TRANSACTION_LIMIT:
+            return f"Amount exceeds spending limit for {purpose}"
+        if decision == OVER_PERIOD_LIMIT:
+            return f"Amount exceeds the {self.period // 86400}-day limit for {purpose}"
+        return None
+
+    def check(self, student, vendor, amount, purpose, now=None):
+        """Return the rejection message for one spend, or None if the policy allows it."""
+        purpose_code = self.purpose_codes.get(purpose, self.unknown_purpose)
+        decision = self._table_rows[self.vendor_codes.get(vendor, self.unknown_vendor)][purpose_code]
+        if decision == ALLOWED:
+            if amount > self._per_transaction[purpose_code]:
+                decision = OVER_TRANSACTION_LIMIT
+            elif self.spent(student, purpose_code, now) + amount > self._per_period[purpose_code]:
+                decision = OVER_PERIOD_LIMIT
+            else:
+                return None
+        return self.message(decision, purpose)
+
+    def check_batch(self, students, vendors, amounts, purposes, now=None):
+        """Vectorized check of many spends; returns one message (or None) per spend.
+
+        Allowed spends for the same student and purpose count against the
+        period limit cumulatively in input order, including the one that
+        would breach it, so the result errs on the side of rejecting.
+        """
+        purposes = list(purposes)
+        vendor_codes = pd.Series(vendors, dtype=object).map(self.vendor_codes).fillna(self.unknown_vendor).to_numpy(np.int64)
+        purpose_codes = pd.Series(purposes, dtype=object).map(self.purpose_codes).fillna(self.unknown_purpose).to_numpy(np.int64)
+        amounts = np.asarray(amounts, dtype=np.int64)
+        decisions = self.table[vendor_codes, purpose_codes]
+        decisions[(decisions == ALLOWED) & (amounts > self.per_transaction[purpose_codes])] = OVER_TRANSACTION_LIMIT
+
+        allowed = decisions == ALLOWED
+        if allowed.any():
+            # Running total per (student, purpose) group: stable-sort by group, cumsum, subtract each group's offset.
+            student_codes, student_names = pd.factorize(pd.Series(students, dtype=object))
+            groups = student_codes.astype(np.int64) * (self.unknown_purpose + 1) + purpose_codes
+            order = np.argsort(groups, kind='stable')
+            sorted_groups = groups[order]
+            sorted_totals = np.cumsum(np.where(allowed, amounts, 0)[order])
+            starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+            offsets = np.r_[0, sorted_totals[starts[1:] - 1]]
+            group_index = np.cumsum(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]]) - 1
+            prior = np.zeros(len(starts), dtype=np.int64)
+            if self._totals:
+                now = time.time() if now is None else now
+                prior[:] = [self.spent(student_names[group // (self.unknown_purpose + 1)], group % (self.unknown_purpose + 1), now)
+                            for group in sorted_groups[starts].tolist()]
+            running = np.empty_like(amounts)
+            running[order] = sorted_totals - offsets[group_index] + prior[group_index]
+            decisions[allowed & (running > self.per_period[purpose_codes])] = OVER_PERIOD_LIMIT
+
+        messages = [None] * len(purposes)
+        cache = {}
+        for i in np.flatnonzero(decisions != ALLOWED).tolist():
+            key = (int(decisions[i]), purposes[i])
+            if key not in cache:
+                cache[key] = self.message(*key)
+            messages[i] = cache[key]
+        return messages
+
+    def load_totals(self, students, purposes, amounts, timestamps, now=None):
+        """Rebuild the rolling totals from past spends (e.g. the journal after a restart), oldest first."""
+        now = time.time() if now is None else now
+        frame = pd.DataFrame({'student': students, 'purpose': purposes, 'amount': amounts, 'timestamp': timestamps})
+        frame = frame[(frame['timestamp'] > now - self.period) & frame['purpose'].isin(self.purpose_codes)]
+        totals = {}
+        for (student, purpose), group in frame.groupby(['student', 'purpose'], sort=False):
+            group = group.sort_values('timestamp', kind='stable')
+            spends = deque(zip(group['timestamp'].tolist(), group['amount'].astype(int).tolist()))
+            totals[(student, self.purpose_codes[purpose])] = [spends, int(group['amount'].sum())]
+        self._totals = totals
+
+
+def load_policy(path=None):
+    with open(path or POLICY_PATH) as f:
+        return SpendingPolicy(json.load(f))
@@ -0,0 +1,120 @@
+"""Two-tier LRU/TTL cache for chatbot replies.
+
+A key is the normalized prompt, a digest of the last few history messages
+and the model/preamble version, so the common opening questions hit the
+same entry for every user. Entries live in an in-memory LRU and in a
+SQLite file that survives restarts; both expire after `ttl` seconds and
+the disk tier is trimmed to `disk_size` least recently used rows.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from instrumentation import count
+
+CACHE_PATH = os.environ.get(
+    'ETHCASH_RESPONSE_CACHE',
+    os.path.join(os.environ.get('ETHCASH_DATA_DIR', 'ethcash_data'), 'responses.sqlite3')
+)
+
+
+def normalize_prompt(prompt):
+    return ' '.join(prompt.casefold().split()).rstrip('?!. ')
+
+
+class ResponseCache:
+    def __init__(self, path=CACHE_PATH, memory_size=512, disk_size=50_000, ttl=24 * 3600, history_window=4):
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.ttl = ttl
+        self.history_window = history_window
+        self.hits = self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._rows = 0
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL, used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_used ON responses (used)")
+            self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - ttl,))
+            self._rows = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def key(self, prompt, history, model, preamble):
+        """Cache key for a prompt sent with `history` (dicts with role/message) to `model`."""
+        window = [(m['role'], m['message']) for m in history[-self.history_window:]] if self.history_window else []
+        material = json.dumps([
+            normalize_prompt(prompt),
+            window,
+            model,
+            hashlib.sha256(preamble.encode()).hexdigest(),
+        ])
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[0] < self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    count('response_cache.hit_memory')
+                    return entry[1]
+                del self._memory[key]
+            if self._db is not None:
+                row = self._db.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None and now - row[1] < self.ttl:
+                    self._db.execute("UPDATE responses SET used = ? WHERE key = ?", (now, key))
+                    self._remember(key, row[1], row[0])
+                    self.hits += 1
+                    count('response_cache.hit_disk')
+                    return row[0]
+            self.misses += 1
+            count('response_cache.miss')
+            return None
+
+    def put(self, key, response):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, response)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, created, used) VALUES (?, ?, ?, ?)",
+                    (key, response, now, now)
+                )
+                # _rows over-counts replaced keys; it only decides when to recount and trim in bulk.
+                self._rows += 1
+                if self._rows > self.disk_size * 1.1:
+                    self._rows = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+                    if self._rows > self.disk_size:
+                        self._db.execute(
+                            "DELETE FROM responses WHERE key IN "
+                            "(SELECT key FROM responses ORDER BY used LIMIT ?)",
+                            (self._rows - self.disk_size,)
+                        )
+                        self._rows = self.disk_size
+
+    def _remember(self, key, created, response):
+        self._memory[key] = (created, response)
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'memory_entries': len(self._memory),
+        }
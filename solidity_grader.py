@@ -0,0 +1,269 @@
+"""Offline grader for the Solidity snippets players write in the games.
+
+No solc: a regex tokenizer and a light structural parse pick out the
+contracts, state variables and functions of a snippet, which is enough to
+check a chapter's requirements (a public uint state variable, a pure
+function returning uint, ...). Parsed snippets are cached by the SHA-256
+of their source, so regrading or batch-grading identical submissions
+skips straight to the checks.
+
+Checks are dicts, usually from a chapter pack's `checks` list:
+
+    {"check": "state_variable", "type": "uint", "visibility": "public"}
+    {"check": "function", "mutability": "pure", "returns": ["uint"], "body_contains": ["+"]}
+    {"check": "function", "visibility": "public", "assigns_state": true}
+    {"check": "contract"}
+
+Every check can carry a `hint` shown when it fails.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+_TOKEN = re.compile(r"""
+    (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+  | (?P<number>0x[0-9a-fA-F]+|\d[\d_]*(?:\.\d+)?(?:e\d+)?)
+  | (?P<ident>[A-Za-z_$][A-Za-z0-9_$]*)
+  | (?P<op>==|!=|<=|>=|&&|\|\||\+\+|--|\+=|-=|\*=|/=|%=|=>|\*\*|<<|>>|[-+*/%=<>!&|^~?:;,.(){}\[\]])
+  | (?P<space>\s+)
+  | (?P<error>.)
+""", re.S | re.X)
+
+VISIBILITY = {'public', 'external', 'internal', 'private'}
+MUTABILITY = {'pure', 'view', 'payable'}
+ASSIGNMENTS = {'=', '+=', '-=', '*=', '/=', '%=', '++', '--'}
+# Member declarations that aren't state variables or functions.
+OTHER_MEMBERS = {'event', 'modifier', 'struct', 'enum', 'using', 'error', 'type'}
+ALIASES = {'uint': 'uint256', 'int': 'int256', 'byte': 'bytes1'}
+
+
+def tokenize(source):
+    """(kind, text) tokens without whitespace and comments; unknown characters become 'error' tokens."""
+    return [(match.lastgroup, match.group()) for match in _TOKEN.finditer(source)
+            if match.lastgroup not in ('space', 'comment')]
+
+
+def normalize_type(name):
+    return ALIASES.get(name, name)
+
+
+def _skip_group(tokens, i, open_, close):
+    """Index just past the bracket group that starts at tokens[i]."""
+    depth = 0
+    while i < len(tokens):
+        text = tokens[i][1]
+        if text == open_:
+            depth += 1
+        elif text == close:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return i
+
+
+def _parse_function(tokens, i):
+    """Parse `function name(params) specifiers [returns (...)] {body}` starting at the keyword.
+
+    constructor, receive and fallback have no name and are recorded under their keyword.
+    """
+    keyword = tokens[i][1]
+    name = keyword
+    if keyword == 'function':
+        name = tokens[i + 1][1] if i + 1 < len(tokens) and tokens[i + 1][0] == 'ident' else ''
+    i = _skip_group(tokens, i + 1, '(', ')')
+    function = {'name': name, 'visibility': None, 'mutability': None, 'returns': [], 'body': []}
+    while i < len(tokens) and tokens[i][1] not in ('{', ';'):
+        text = tokens[i][1]
+        if text in VISIBILITY:
+            function['visibility'] = text
+        elif text in MUTABILITY:
+            function['mutability'] = text
+        elif text == 'returns':
+            end = _skip_group(tokens, i + 1, '(', ')')
+            expect_type = True
+            for kind, part in tokens[i + 2:end - 1]:
+                if expect_type and kind == 'ident':
+                    function['returns'].append(normalize_type(part))
+                    expect_type = False
+                elif part == ',':
+                    expect_type = True
+            i = end
+            continue
+        i += 1
+    if i < len(tokens) and tokens[i][1] == '{':
+        end = _skip_group(tokens, i, '{', '}')
+        function['body'] = tokens[i + 1:end - 1]
+        i = end
+    else:
+        i += 1
+    return function, i
+
+
+def _parse_state_variable(statement):
+    if not statement or statement[0][0] != 'ident':
+        return None
+    declaration = statement
+    for position, (_, text) in enumerate(statement):
+        if text == '=':
+            declaration = statement[:position]
+            break
+    names = [text for kind, text in declaration if kind == 'ident']
+    if len(names) < 2:
+        return None
+    return {
+        'type': normalize_type(declaration[0][1]),
+        'name': names[-1],
+        'visibility': next((text for text in names[1:-1] if text in VISIBILITY), 'internal'),
+        'constant': 'constant' in names or 'immutable' in names,
+    }
+
+
+def parse(tokens):
+    """Contracts with their state variables and functions, plus structural errors."""
+    errors = [f"Unexpected character {text!r}" for kind, text in tokens if kind == 'error']
+    for open_, close, name in (('{', '}', 'braces'), ('(', ')', 'parentheses')):
+        if sum(text == open_ for _, text in tokens) != sum(text == close for _, text in tokens):
+            errors.append(f"Unbalanced {name}")
+
+    contracts = []
+    i = 0
+    while i < len(tokens):
+        if tokens[i][1] in ('contract', 'library', 'interface', 'abstract') and i + 1 < len(tokens):
+            if tokens[i][1] == 'abstract':
+                i += 1
+                if i + 1 >= len(tokens):
+                    break
+            name = tokens[i + 1][1]
+            while i < len(tokens) and tokens[i][1] != '{':
+                i += 1
+            end = _skip_group(tokens, i, '{', '}')
+            contracts.append(_parse_members(name, tokens[i + 1:end - 1]))
+            i = end
+        else:
+            i += 1
+    if not contracts and not errors:
+        errors.append("No contract found")
+    return {'contracts': contracts, 'errors': errors}
+
+
+def _parse_members(name, tokens):
+    contract = {'name': name, 'state_variables': [], 'functions': []}
+    i = 0
+    while i < len(tokens):
+        text = tokens[i][1]
+        if text in ('function', 'constructor', 'receive', 'fallback'):
+            function, i = _parse_function(tokens, i)
+            contract['functions'].append(function)
+        elif text in OTHER_MEMBERS:
+            while i < len(tokens) and tokens[i][1] not in (';', '{'):
+                i += 1
+            i = _skip_group(tokens, i, '{', '}') if i < len(tokens) and tokens[i][1] == '{' else i + 1
+        else:
+            start = i
+            while i < len(tokens) and tokens[i][1] != ';':
+                i = _skip_group(tokens, i, tokens[i][1], ')') if tokens[i][1] == '(' else i + 1
+            variable = _parse_state_variable(tokens[start:i])
+            if variable:
+                contract['state_variables'].append(variable)
+            i += 1
+    return contract
+
+
+class ParseCache:
+    """Bounded LRU of parsed snippets keyed by the SHA-256 of their source."""
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, source):
+        key = hashlib.sha256(source.encode()).digest()
+        with self._lock:
+            parsed = self._entries.get(key)
+            if parsed is not None:
+                self._entries.move_to_end(key)
+                return parsed
+        parsed = parse(tokenize(source))
+        with self._lock:
+            self._entries[key] = parsed
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return parsed
+
+
+parsed_snippets = ParseCache()
+
+
+def describe(check):
+    kind = check['check']
+    if kind == 'contract':
+        return "Declare a contract"
+    if kind == 'state_variable':
+        return f"Declare a {check.get('visibility', '')} {check.get('type', '')} state variable".replace('  ', ' ')
+    parts = [check.get('visibility'), check.get('mutability'), 'function']
+    text = ' '.join(filter(None, parts))
+    if check.get('name'):
+        text += f" named {check['name']}"
+    if check.get('returns'):
+        text += f" returning {', '.join(check['returns'])}"
+    if check.get('assigns_state'):
+        text += " that updates a state variable"
+    if check.get('body_contains'):
+        text += f" using {', '.join(f'`{token}`' for token in check['body_contains'])}"
+    return f"Write a {text}"
+
+
+def _matches(contract, check):
+    kind = check['check']
+    if kind == 'contract':
+        return True
+    if kind == 'state_variable':
+        return any(
+            ('type' not in check or variable['type'] == normalize_type(check['type']))
+            and ('visibility' not in check or variable['visibility'] == check['visibility'])
+            and ('name' not in check or variable['name'] == check['name'])
+            for variable in contract['state_variables']
+        )
+    if kind == 'function':
+        state_names = {variable['name'] for variable in contract['state_variables']}
+        for function in contract['functions']:
+            body = [text for _, text in function['body']]
+            if 'name' in check and function['name'] != check['name']:
+                continue
+            if 'visibility' in check and function['visibility'] != check['visibility']:
+                continue
+            if 'mutability' in check and function['mutability'] != check['mutability']:
+                continue
+            if 'returns' in check and function['returns'] != [normalize_type(t) for t in check['returns']]:
+                continue
+            if any(token not in body for token in check.get('body_contains', ())):
+                continue
+            if check.get('assigns_state') and not any(
+                    body[j] in state_names and body[j + 1] in ASSIGNMENTS for j in range(len(body) - 1)):
+                continue
+            return True
+        return False
+    raise ValueError(f"Unknown check '{kind}'")
+
+
+def grade(source, checks):
+    """Grade one snippet: {'passed', 'results': [(description, ok, hint)], 'errors'}."""
+    parsed = parsed_snippets.get(source)
+    results = []
+    for check in checks:
+        ok = not parsed['errors'] and any(_matches(contract, check) for contract in parsed['contracts'])
+        results.append((describe(check), ok, None if ok else check.get('hint')))
+    return {
+        'passed': not parsed['errors'] and all(ok for _, ok, _ in results),
+        'results': results,
+        'errors': parsed['errors'],
+    }
+
+
+def grade_batch(submissions):
+    """Grade many (source, checks) pairs in one call; identical sources are parsed once."""
+    return [grade(source, checks) for source, checks in submissions]
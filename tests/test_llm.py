@@ -0,0 +1,121 @@
+import threading
+import time
+
+import pytest
+
+from llm import LLMGateway, LLMTimeout, StubClient
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FailingClient(StubClient):
+    def __init__(self, error):
+        super().__init__()
+        self.error = error
+
+    def chat(self, message, **kwargs):
+        self._call('chat', message, kwargs)
+        raise self.error
+
+
+def test_transient_failures_are_retried():
+    gateway = LLMGateway(StubClient(failures=2), backoff=0.001)
+    assert gateway.chat(message="hi").text == "(offline) You asked: hi"
+    assert len(gateway.client.calls) == 3
+
+
+def test_retries_give_up_after_the_limit():
+    gateway = LLMGateway(StubClient(failures=5), retries=2, backoff=0.001)
+    with pytest.raises(ConnectionError):
+        gateway.chat(message="hi")
+    assert len(gateway.client.calls) == 3
+
+
+def test_client_errors_are_not_retried():
+    gateway = LLMGateway(FailingClient(StatusError(400)), backoff=0.001)
+    with pytest.raises(StatusError):
+        gateway.chat(message="hi")
+    assert len(gateway.client.calls) == 1
+
+
+def test_rate_limits_are_retried():
+    gateway = LLMGateway(FailingClient(StatusError(429)), retries=1, backoff=0.001)
+    with pytest.raises(StatusError):
+        gateway.chat(message="hi")
+    assert len(gateway.client.calls) == 2
+
+
+def test_slow_call_times_out_at_the_deadline():
+    gateway = LLMGateway(StubClient(latency=0.5))
+    started = time.monotonic()
+    with pytest.raises(LLMTimeout):
+        gateway.generate(prompt="story", deadline=0.1)
+    assert time.monotonic() - started < 0.4
+
+
+def test_identical_concurrent_calls_share_one_upstream_call():
+    gateway = LLMGateway(StubClient(latency=0.2))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(gateway.chat(message="same").text)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["(offline) You asked: same"] * 5
+    assert len(gateway.client.calls) == 1
+
+
+def test_different_calls_are_not_coalesced():
+    gateway = LLMGateway(StubClient())
+    gateway.chat(message="one")
+    gateway.chat(message="two")
+    assert len(gateway.client.calls) == 2
+
+
+def test_stream_yields_every_event():
+    gateway = LLMGateway(StubClient())
+    events = list(gateway.chat_stream(message="a b c"))
+    assert ''.join(e.text for e in events if e.event_type == 'text-generation') == "(offline) You asked: a b c"
+    assert events[-1].event_type == 'stream-end'
+
+
+def test_stream_retries_before_the_first_event():
+    gateway = LLMGateway(StubClient(failures=1), backoff=0.001)
+    assert list(gateway.chat_stream(message="hi"))[-1].response.text == "(offline) You asked: hi"
+    assert len(gateway.client.calls) == 2
+
+
+def test_stream_times_out_waiting_for_the_first_event():
+    gateway = LLMGateway(StubClient(latency=0.5))
+    with pytest.raises(LLMTimeout):
+        list(gateway.chat_stream(message="hi", deadline=0.1))
+
+
+def test_stream_times_out_when_it_stalls_between_events():
+    gateway = LLMGateway(StubClient(stream_latency=0.5))
+    stream = gateway.chat_stream(message="a b c", deadline=0.1)
+    next(stream)
+    with pytest.raises(LLMTimeout):
+        list(stream)
+
+
+def test_abandoned_stream_releases_its_slot():
+    gateway = LLMGateway(StubClient(stream_latency=0.05), max_concurrency=1)
+    stream = gateway.chat_stream(message="a b c d")
+    next(stream)
+    stream.close()
+    # The next call needs the only slot back.
+    assert gateway.chat(message="next", deadline=1).text == "(offline) You asked: next"
+
+
+def test_client_is_created_on_first_call():
+    created = []
+    gateway = LLMGateway(client_factory=lambda: created.append(StubClient()) or created[-1])
+    assert created == []
+    gateway.chat(message="hi")
+    gateway.chat(message="again")
+    assert len(created) == 1
@@ -0,0 +1,84 @@
+import response_cache
+from llm import LLMGateway, StubClient
+from response_cache import ResponseCache
+
+MODEL = 'command-r-plus'
+PREAMBLE = "You are EthBot."
+
+
+def cached_reply(cache, gateway, prompt, history=()):
+    """The EthBot lookup path: answer from the cache, else ask the model and store the reply."""
+    key = cache.key(prompt, list(history), MODEL, PREAMBLE)
+    reply = cache.get(key)
+    if reply is None:
+        reply = gateway.chat(message=prompt, model=MODEL).text
+        cache.put(key, reply)
+    return reply
+
+
+def test_miss_then_memory_hit(tmp_path):
+    cache = ResponseCache(tmp_path / 'responses.sqlite3')
+    gateway = LLMGateway(StubClient())
+    first = cached_reply(cache, gateway, "What is Ethereum?")
+    second = cached_reply(cache, gateway, "  what is ETHEREUM  ")
+    assert first == second
+    assert len(gateway.client.calls) == 1
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_history_and_model_are_part_of_the_key(tmp_path):
+    cache = ResponseCache(tmp_path / 'responses.sqlite3')
+    history = [{'role': 'User', 'message': "Hi"}, {'role': 'Chatbot', 'message': "Hello!"}]
+    assert cache.key("gas?", [], MODEL, PREAMBLE) != cache.key("gas?", history, MODEL, PREAMBLE)
+    assert cache.key("gas?", [], MODEL, PREAMBLE) != cache.key("gas?", [], 'command-r', PREAMBLE)
+    assert cache.key("gas?", [], MODEL, PREAMBLE) != cache.key("gas?", [], MODEL, PREAMBLE + " Be brief.")
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(response_cache.time, 'time', lambda: now[0])
+    cache = ResponseCache(tmp_path / 'responses.sqlite3', ttl=60)
+    cache.put('k', "reply")
+    now[0] += 59
+    assert cache.get('k') == "reply"
+    now[0] += 2
+    assert cache.get('k') is None
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    path = tmp_path / 'responses.sqlite3'
+    gateway = LLMGateway(StubClient())
+    cached_reply(ResponseCache(path), gateway, "What is a smart contract?")
+
+    reopened = ResponseCache(path)
+    assert cached_reply(reopened, gateway, "What is a smart contract?") == "(offline) You asked: What is a smart contract?"
+    assert len(gateway.client.calls) == 1
+    assert reopened.stats()['hits'] == 1
+
+
+def test_expired_rows_are_dropped_on_open(tmp_path, monkeypatch):
+    path = tmp_path / 'responses.sqlite3'
+    now = [1_000_000.0]
+    monkeypatch.setattr(response_cache.time, 'time', lambda: now[0])
+    ResponseCache(path, ttl=60).put('k', "reply")
+    now[0] += 120
+    assert ResponseCache(path, ttl=60).get('k') is None
+
+
+def test_memory_tier_is_lru_bounded(tmp_path):
+    cache = ResponseCache(None, memory_size=2)
+    cache.put('a', "A")
+    cache.put('b', "B")
+    cache.get('a')
+    cache.put('c', "C")
+    assert cache.get('b') is None
+    assert cache.get('a') == "A" and cache.get('c') == "C"
+
+
+def test_disk_tier_is_trimmed_to_disk_size(tmp_path):
+    path = tmp_path / 'responses.sqlite3'
+    cache = ResponseCache(path, memory_size=1, disk_size=10)
+    for i in range(30):
+        cache.put(f'k{i}', str(i))
+    assert cache._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] <= 11
+    assert cache.get('k29') == "29"
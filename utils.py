@@ -14,9 +14,19 @@
 
 import inspect
 import textwrap
+from functools import lru_cache
 
 import streamlit as st
 
+from solidity_grader import grade
+
+
+@lru_cache(maxsize=None)
+def demo_source(demo):
+    """The demo's body without its def line, read from disk once per process."""
+    sourcelines, _ = inspect.getsourcelines(demo)
+    return textwrap.dedent("".join(sourcelines[1:]))
+
 
 def show_code(demo):
     """Showing the code of the demo."""
@@ -24,5 +34,18 @@ def show_code(demo):
     if show_code:
         # Showing the code of the demo.
         st.markdown("## Code")
-        sourcelines, _ = inspect.getsourcelines(demo)
-        st.code(textwrap.dedent("".join(sourcelines[1:])))
+        st.code(demo_source(demo))
+
+
+def code_checker(chapter, key):
+    """Let the player write their own solution and grade it offline against the chapter's checks."""
+    submission = st.text_area("✍️ Write your own solution", key=key, height=180)
+    if chapter['checks'] and st.button("Check My Code") and submission.strip():
+        report = grade(submission, chapter['checks'])
+        for error in report['errors']:
+            st.error(error)
+        for description, ok, hint in report['results']:
+            if ok:
+                st.success(f"✅ {description}")
+            else:
+                st.warning(f"❌ {description}" + (f" — {hint}" if hint else ""))
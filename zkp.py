@@ -0,0 +1,231 @@
+import hashlib
+import multiprocessing
+import os
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, padding, rsa
+
+from instrumentation import count, timed
+
+
+class RSAEngine:
+    name = 'rsa'
+
+    def generate_keys(self):
+        private_key = rsa.generate_private_key(
+            public_exponent=65537,
+            key_size=2048
+        )
+        return private_key, private_key.public_key()
+
+    def sign(self, private_key, data):
+        return private_key.sign(
+            data,
+            padding.PSS(
+                mgf=padding.MGF1(hashes.SHA256()),
+                salt_length=padding.PSS.MAX_LENGTH
+            ),
+            hashes.SHA256()
+        )
+
+    def verify(self, public_key, signature, data):
+        public_key.verify(
+            signature,
+            data,
+            padding.PSS(
+                mgf=padding.MGF1(hashes.SHA256()),
+                salt_length=padding.PSS.MAX_LENGTH
+            ),
+            hashes.SHA256()
+        )
+
+
+class Ed25519Engine:
+    name = 'ed25519'
+
+    def generate_keys(self):
+        private_key = ed25519.Ed25519PrivateKey.generate()
+        return private_key, private_key.public_key()
+
+    def sign(self, private_key, data):
+        return private_key.sign(data)
+
+    def verify(self, public_key, signature, data):
+        public_key.verify(signature, data)
+
+
+class ECDSAEngine:
+    name = 'p256'
+
+    def generate_keys(self):
+        private_key = ec.generate_private_key(ec.SECP256R1())
+        return private_key, private_key.public_key()
+
+    def sign(self, private_key, data):
+        return private_key.sign(data, ec.ECDSA(hashes.SHA256()))
+
+    def verify(self, public_key, signature, data):
+        public_key.verify(signature, data, ec.ECDSA(hashes.SHA256()))
+
+
+ENGINES = {engine.name: engine for engine in (RSAEngine(), Ed25519Engine(), ECDSAEngine())}
+
+# Select the signature engine for new accounts, e.g. ETHCASH_SIGNATURE_ENGINE=ed25519
+DEFAULT_ENGINE = os.environ.get('ETHCASH_SIGNATURE_ENGINE', 'rsa')
+
+
+def engine_for(key):
+    if isinstance(key, (rsa.RSAPrivateKey, rsa.RSAPublicKey)):
+        return ENGINES['rsa']
+    if isinstance(key, (ed25519.Ed25519PrivateKey, ed25519.Ed25519PublicKey)):
+        return ENGINES['ed25519']
+    if isinstance(key, (ec.EllipticCurvePrivateKey, ec.EllipticCurvePublicKey)):
+        return ENGINES['p256']
+    raise TypeError(f"Unsupported key type: {type(key).__name__}")
+
+
+class KeyPool:
+    """Pre-generated key pairs for one engine, refilled by a background worker."""
+
+    def __init__(self, engine, size=32):
+        self.engine = engine
+        self._keys = queue.Queue(maxsize=size)
+        self._worker = threading.Thread(target=self._refill, name=f"keypool-{engine.name}", daemon=True)
+        self._worker.start()
+
+    def _refill(self):
+        # put() blocks while the pool is full, so the worker only runs after acquire() drains a key.
+        while True:
+            self._keys.put(self.engine.generate_keys())
+
+    @timed('zkp.key_pool_acquire')
+    def acquire(self):
+        try:
+            return self._keys.get_nowait()
+        except queue.Empty:
+            count(f"zkp.key_pool_miss[{self.engine.name}]")
+            return self.engine.generate_keys()
+
+    def __len__(self):
+        return self._keys.qsize()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_key_pool(engine=None):
+    name = engine or DEFAULT_ENGINE
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = KeyPool(ENGINES[name])
+        return _pools[name]
+
+
+class VerifiedProofCache:
+    """Bounded LRU of proofs that already passed verification."""
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(public_key, signature, public):
+        # The signature is part of the key so a cached payload can't vouch for a forged proof.
+        public_bytes = public_key.public_bytes(
+            serialization.Encoding.DER,
+            serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        return (
+            hashlib.sha256(public_bytes).digest(),
+            hashlib.sha256(public.encode()).digest(),
+            hashlib.sha256(signature).digest(),
+        )
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return True
+            return False
+
+    def add(self, key):
+        with self._lock:
+            self._entries[key] = True
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+verified_proofs = VerifiedProofCache()
+
+
+def serialize_private_key(private_key):
+    return private_key.private_bytes(
+        serialization.Encoding.DER,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    )
+
+
+def sign_batch(key_der, payloads):
+    """Sign and verify payloads for one account. Runs in a worker process."""
+    private_key = serialization.load_der_private_key(key_der, password=None)
+    public_key = private_key.public_key()
+    engine = engine_for(private_key)
+    results = []
+    for public in payloads:
+        signature = engine.sign(private_key, public.encode())
+        try:
+            engine.verify(public_key, signature, public.encode())
+            results.append((signature, True))
+        except Exception:
+            results.append((signature, False))
+    return results
+
+
+_process_pool = None
+
+
+def get_process_pool():
+    global _process_pool
+    with _pools_lock:
+        if _process_pool is None:
+            # Not fork: by now the key pool, ledger log and Streamlit threads are running, and a forked
+            # worker could inherit a lock (e.g. OpenSSL's) that one of them held.
+            _process_pool = ProcessPoolExecutor(mp_context=multiprocessing.get_context('forkserver'))
+        return _process_pool
+
+
+class EnhancedZKProof:
+    @staticmethod
+    @timed('zkp.generate_keys')
+    def generate_keys(engine=None):
+        return ENGINES[engine or DEFAULT_ENGINE].generate_keys()
+
+    @staticmethod
+    @timed('zkp.generate_proof')
+    def generate_proof(private_key, public):
+        return engine_for(private_key).sign(private_key, public.encode())
+
+    @staticmethod
+    @timed('zkp.verify_proof')
+    def verify_proof(public_key, signature, public):
+        key = verified_proofs.key(public_key, signature, public)
+        if key in verified_proofs:
+            count('zkp.verified_proof_cache_hit')
+            return True
+        try:
+            engine_for(public_key).verify(public_key, signature, public.encode())
+        except Exception:
+            return False
+        verified_proofs.add(key)
+        return True